@@ -0,0 +1,191 @@
+"""
+Benchmarks for the catalog and simulation hot paths.
+
+    python bench.py [--synthetic N] [--real DIR] [--repeat N] [--workers N]
+                    [--out FILE] [--baseline FILE] [--tolerance F] [--save-baseline]
+
+Metrics (every one is a time, lower is better):
+
+    catalog.<corpus>.cold_ms      refresh() + load_materials() into an empty index
+    catalog.<corpus>.warm_ms      the same with nothing changed on disk (the get_mats() path)
+    catalog.<corpus>.reload_ms    load_materials() rebuilding the catalog from the table
+    extract.<corpus>.p50_ms ...   per-file extraction time distribution of the cold run
+    simulate.<model>.L<n>_us      _simulate() for n layers, linear and λ(T) model
+    http.<route>_ms               /api/init (plain, gzip, 304) and /api/simulate (cache misses; _cached: a hit) through a TestClient
+
+The synthetic corpus is generated with fpdf (synthetic_corpus), so the suite
+runs offline; --real adds a directory of real TDS files (default TDS_PATH,
+skipped when empty). Results are written to --out and compared with
+--baseline: a metric more than --tolerance slower than its baseline, and at
+least FLOOR_MS slower in absolute terms, is a regression -> exit code 1.
+"""
+import os, sys, json, time, random, itertools, shutil, argparse, platform, tempfile, statistics
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+FLOOR_MS = 1.0  # absolute slack so sub-millisecond jitter never counts as a regression
+LAYERS = (1, 2, 4, 8)
+
+PRODUCTS = ("CALDE CAST", "CALDE GUN", "CALDE FLOW", "CALDE TROWEL", "CALDE PLAST", "CALDE SPRAYCAST", "SILICA MIX", "CALDE MIX")
+GRADES = ("LX", "LW", "NB", "F", "LT", "MW", "HQ", "SC")
+CUSTOMERS = ("Arcelor Mittal Steel Zenica", "HBIS GROUP Serbia Iron & Steel", "Titan Usje", "RTB Bor", "Livnica Kikinda")
+WORDS = ("installation", "dry-out", "schedule", "anchoring", "mixing", "water", "addition", "storage", "shelf", "life",
+         "months", "packaging", "bags", "pallet", "curing", "ambient", "lining", "thickness", "vibration", "formwork")
+
+
+def synthetic_tds(path, name, rng, pages=1):
+    """One TDS-like PDF: properties on page 1, the λ(T) table on the last page, filler text in between."""
+    from fpdf import FPDF
+    pdf = FPDF(); pdf.set_auto_page_break(False)
+    fired, t_max = rng.choice((800, 1000, 1100)), rng.randrange(1200, 1800, 50)
+    lines = [name, "TECHNICAL DATA SHEET", f"Maximum service temperature {t_max} °C",
+             f"Bulk density after firing at {fired} °C EN ISO 1927-6 {rng.uniform(0.6, 2.9):.2f} g/cm3",
+             f"Cold crushing strength after firing at {fired} °C EN ISO 1927-6 {rng.randrange(5, 120)} MPa"]
+    lines += [f"{ox} {pct:.1f} %" for ox, pct in (("Al2O3", rng.uniform(30, 90)), ("SiO2", rng.uniform(5, 60)),
+                                                 ("Fe2O3", rng.uniform(0.2, 2)), ("CaO", rng.uniform(0.5, 6)))]
+    lam = rng.uniform(0.15, 2.0)
+    table = [f"Thermal conductivity at {t} °C EN ISO 8894-1 {lam * (1 + t / 2000):.2f} W/mK" for t in (200, 400, 600, 800, 1000)]
+    for i in range(pages):
+        pdf.add_page(); pdf.set_font("Helvetica", size=10)
+        body = (lines if i == 0 else []) + (table if i == pages - 1 else [])
+        if 0 < i < pages - 1 or not body: body = [" ".join(rng.choice(WORDS) for _ in range(14)) for _ in range(40)]
+        for line in body: pdf.cell(0, 6, line, ln=1)
+    pdf.output(path, "F")
+
+
+def synthetic_corpus(root, n=60, seed=7):
+    """n files in root: distinct products filed under customer prefixes, generic sheets and byte-identical copies."""
+    rng, made = random.Random(seed), []
+    os.makedirs(root, exist_ok=True)
+    for i in range(n):
+        if made and rng.random() < 0.2:  # the same sheet filed again for another plant
+            src, name = rng.choice(made)
+            dst = os.path.join(root, f"{rng.randrange(2014, 2025)}_{rng.choice(CUSTOMERS)}_TDS_{name}.pdf")
+            if not os.path.exists(dst): shutil.copyfile(src, dst)
+            continue
+        name = f"{rng.choice(PRODUCTS)} {rng.choice(GRADES)} {rng.randrange(10, 99)} {i}"
+        fn = f"{name} TDS.pdf" if rng.random() < 0.3 else f"{rng.randrange(2014, 2025)}_{rng.choice(CUSTOMERS)}_TDS_{name}.pdf"
+        path = os.path.join(root, fn)
+        synthetic_tds(path, name, rng, pages=rng.choice((1, 1, 1, 2, 3, 6)))
+        made.append((path, name))
+    return root
+
+
+def timed(fn, repeat=1):
+    """Median wall time of fn() in seconds."""
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); runs.append(time.perf_counter() - t0)
+    return statistics.median(runs)
+
+
+def _fresh_db(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix): os.remove(path + suffix)
+
+
+def bench_catalog(label, root, workers, out):
+    import db, tds_index
+    from contextlib import closing
+    _fresh_db(db.DB_PATH); tds_index._MATS = (None, [], {}, [])  # cold: no table, no in-process catalog
+    with closing(db.connect()) as conn: tds_index.init_schema(conn); conn.commit()
+    t0 = time.perf_counter()
+    report = tds_index.refresh(root, workers=workers)
+    mats = tds_index.load_materials()
+    out[f"catalog.{label}.cold_ms"] = (time.perf_counter() - t0) * 1000
+    out[f"catalog.{label}.warm_ms"] = timed(lambda: (tds_index.refresh(root, workers=workers), tds_index.load_materials()), 5) * 1000
+    def reload(): tds_index._MATS = (None, [], {}, []); tds_index.load_materials()
+    out[f"catalog.{label}.reload_ms"] = timed(reload, 5) * 1000
+    for k, v in (report["extract_ms"] or {}).items(): out[f"extract.{label}.{k}_ms"] = v
+    return {"files": report["files"], "extracted": report["extracted"], "failed": report["failed"], "materials": len(mats)}
+
+
+def bench_simulate(repeat, out):
+    import main, tds_index
+    mats = [m for m in tds_index.load_materials() if m["lambda_t"][0]] or tds_index.load_materials()
+    for n in LAYERS:
+        layers = [{"material": mats[i % len(mats)]["name"], "thickness": 60, "lambda_val": mats[i % len(mats)]["lambda_val"],
+                   "density": mats[i % len(mats)]["density"], "price": 950} for i in range(n)]
+        for model, nonlinear in (("linear", False), ("nonlinear", True)):
+            r = main.SimReq(metal="steel", target_temp=1100, ambient_temp=20, layers=layers, nonlinear=nonlinear)
+            main._simulate(r)
+            out[f"simulate.{model}.L{n}_us"] = timed(lambda: main._simulate(r), repeat) * 1e6
+    return layers
+
+
+def bench_http(repeat, layers, out):
+    import main
+    from fastapi.testclient import TestClient
+    sim = {"metal": "steel", "target_temp": 1100, "ambient_temp": 20, "layers": layers}
+    with TestClient(main.app) as cl:
+        main.READY.wait(120)
+        etag = cl.get("/api/init").headers["etag"]
+        out["http.init_ms"] = timed(lambda: cl.get("/api/init", headers={"accept-encoding": "identity"}), repeat) * 1000
+        out["http.init_gzip_ms"] = timed(lambda: cl.get("/api/init", headers={"accept-encoding": "gzip"}), repeat) * 1000
+        out["http.init_304_ms"] = timed(lambda: cl.get("/api/init", headers={"if-none-match": etag}), repeat) * 1000
+        # a new hot-face thickness on every call, so each one misses SIM_CACHE and runs the model
+        step = itertools.count(1)
+        def varied(**kw): return {**sim, **kw, "layers": [{**layers[0], "thickness": layers[0]["thickness"] + next(step) * 1e-3}] + layers[1:]}
+        out["http.simulate_ms"] = timed(lambda: cl.post("/api/simulate", json=varied()), repeat) * 1000
+        out["http.simulate_nonlinear_ms"] = timed(lambda: cl.post("/api/simulate", json=varied(nonlinear=True)), repeat) * 1000
+        cl.post("/api/simulate", json=sim)
+        out["http.simulate_cached_ms"] = timed(lambda: cl.post("/api/simulate", json=sim), repeat) * 1000
+
+
+def compare(metrics, baseline, tolerance):
+    """[(metric, baseline, current)] for every metric that regressed against the baseline."""
+    bad = []
+    for k, b in baseline.items():
+        c = metrics.get(k)
+        if c is None or b is None: continue
+        floor = FLOOR_MS * (1000 if k.endswith("_us") else 1)
+        if c > b * (1 + tolerance) and c - b > floor: bad.append((k, b, c))
+    return bad
+
+
+def run(a):
+    work = tempfile.mkdtemp(prefix="molty-bench-")
+    synth = synthetic_corpus(os.path.join(work, "tds"), a.synthetic)
+    # before any project import: config reads these once
+    os.environ.update(MOLTY_DB=os.path.join(work, "bench.db"), MOLTY_TDS_PATH=synth, MOLTY_WATCH="0", MOLTY_REBUILD_ON_START="0")
+    metrics, corpora = {}, {}
+    try:
+        if a.real and os.path.isdir(a.real) and any(f.endswith((".pdf", ".zip")) for f in os.listdir(a.real)):
+            corpora["real"] = bench_catalog("real", a.real, a.workers, metrics)
+        corpora["synthetic"] = bench_catalog("synthetic", synth, a.workers, metrics)  # last: the app benches below run on it
+        layers = bench_simulate(a.repeat, metrics)
+        bench_http(a.repeat, layers, metrics)
+    finally: shutil.rmtree(work, ignore_errors=True)
+    return {"meta": {"at": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "machine": platform.machine(),
+                     "cpus": os.cpu_count(), "workers": a.workers, "repeat": a.repeat, "corpora": corpora},
+            "metrics": {k: round(v, 3) for k, v in sorted(metrics.items())}}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark catalog extraction and simulation; exit 1 on regression")
+    ap.add_argument("--synthetic", type=int, default=60, help="files in the generated corpus")
+    ap.add_argument("--real", default=os.environ.get("MOLTY_TDS_PATH", "tehnicki_listovi"), help="directory of real TDS files")
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown as a fraction of the baseline")
+    ap.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    a = ap.parse_args(argv)
+    res = run(a)
+    base = {}
+    if os.path.exists(a.baseline):
+        with open(a.baseline) as f: base = json.load(f)["metrics"]
+    res["regressions"] = [{"metric": k, "baseline": b, "current": c} for k, b, c in compare(res["metrics"], base, a.tolerance)]
+    with open(a.out, "w") as f: json.dump(res, f, indent=1)
+    for k, v in res["metrics"].items():
+        b = base.get(k)
+        print(f"{k:40} {v:12.3f}" + (f" {b:12.3f} {100 * (v - b) / b:+7.1f}%" if b else ""))
+    if a.save_baseline:
+        with open(a.baseline, "w") as f: json.dump({"meta": res["meta"], "metrics": res["metrics"]}, f, indent=1)
+        print(f"baseline saved to {a.baseline}"); return 0
+    for r in res["regressions"]: print(f"REGRESSION {r['metric']}: {r['baseline']} -> {r['current']}", file=sys.stderr)
+    return 1 if res["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+In-process LRU + TTL cache with an entry and a byte budget.
+
+Keys come from canonical_key(): the request is dumped as sorted-key JSON with
+floats normalised to a fixed number of significant digits (114 == 114.0 ==
+114.0000001), list order kept — layer order matters. bind_version() drops
+everything when the material catalog version moves, so no result outlives a
+TDS update.
+"""
+import json, time, hashlib, threading
+from collections import OrderedDict
+
+
+def _norm(obj, digits):
+    if isinstance(obj, float): return float(f"{obj:.{digits}g}") + 0.0  # + 0.0 folds -0.0
+    if isinstance(obj, bool) or obj is None or isinstance(obj, str): return obj
+    if isinstance(obj, int): return float(obj)
+    if isinstance(obj, dict): return {k: _norm(v, digits) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)): return [_norm(v, digits) for v in obj]
+    return obj
+
+
+def canonical_key(obj, digits=9):
+    blob = json.dumps(_norm(obj, digits), sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, max_items=4096, max_bytes=16 << 20, ttl=600):
+        self.max_items, self.max_bytes, self.ttl = max_items, max_bytes, ttl
+        self.version, self.bytes = None, 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+        self._d = OrderedDict()  # key -> (expires_at, size, value)
+        self._lock = threading.Lock()
+
+    def bind_version(self, version):
+        with self._lock:
+            if version != self.version:
+                if self._d: self.counters["invalidations"] += 1
+                self._d.clear(); self.bytes = 0; self.version = version
+
+    def get(self, key):
+        with self._lock:
+            hit = self._d.get(key)
+            if hit is None: self.counters["misses"] += 1; return None
+            if hit[0] < time.monotonic():
+                self._drop(key); self.counters["expired"] += 1; self.counters["misses"] += 1; return None
+            self._d.move_to_end(key); self.counters["hits"] += 1
+            return hit[2]
+
+    def put(self, key, value, size=None):
+        size = size if size is not None else len(json.dumps(value, separators=(",", ":")))
+        if size > self.max_bytes: return
+        with self._lock:
+            if key in self._d: self._drop(key)
+            self._d[key] = (time.monotonic() + self.ttl, size, value); self.bytes += size
+            while len(self._d) > self.max_items or self.bytes > self.max_bytes:
+                self._drop(next(iter(self._d))); self.counters["evictions"] += 1
+
+    def _drop(self, key):
+        self.bytes -= self._d.pop(key)[1]
+
+    def clear(self):
+        with self._lock: self._d.clear(); self.bytes = 0
+
+    def stats(self):
+        c = self.counters; total = c["hits"] + c["misses"]
+        return {**c, "items": len(self._d), "bytes": self.bytes, "max_items": self.max_items, "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl, "catalog_version": self.version, "hit_rate": round(c["hits"] / total, 4) if total else None}
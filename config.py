@@ -0,0 +1,42 @@
+"""Shared runtime settings (env overrides for deployments)."""
+import os
+
+DB_PATH = os.environ.get("MOLTY_DB", "molty.db")
+TDS_PATH = os.environ.get("MOLTY_TDS_PATH", "tehnicki_listovi")
+
+# TDS index builds: process-pool size, files per task, per-file extraction budget (s)
+INDEX_WORKERS = int(os.environ.get("MOLTY_INDEX_WORKERS", os.cpu_count() or 1))
+INDEX_CHUNKSIZE = int(os.environ.get("MOLTY_INDEX_CHUNKSIZE", 4))
+INDEX_TIMEOUT = float(os.environ.get("MOLTY_INDEX_TIMEOUT", 60))
+REBUILD_ON_START = os.environ.get("MOLTY_REBUILD_ON_START", "") not in ("", "0")
+
+# documents in flight across all index workers are held to about this much RSS; workers restart every N chunks
+INDEX_MEM_MB = int(os.environ.get("MOLTY_INDEX_MEM_MB", 256))
+INDEX_MAX_TASKS = int(os.environ.get("MOLTY_INDEX_MAX_TASKS", 25))
+
+# background watcher on TDS_PATH (inotify, else stat polling every WATCH_POLL_S)
+WATCH_TDS = os.environ.get("MOLTY_WATCH", "1") not in ("", "0")
+WATCH_POLL_S = float(os.environ.get("MOLTY_WATCH_POLL_S", 5))
+
+# text extraction stops after this many pages even if properties are still missing
+TDS_MAX_PAGES = int(os.environ.get("MOLTY_TDS_MAX_PAGES", 4))
+
+# /api/simulate result cache
+SIM_CACHE_ITEMS = int(os.environ.get("MOLTY_SIM_CACHE_ITEMS", 4096))
+SIM_CACHE_MB = float(os.environ.get("MOLTY_SIM_CACHE_MB", 16))
+SIM_CACHE_TTL = float(os.environ.get("MOLTY_SIM_CACHE_TTL", 600))
+
+# Cache-Control max-age for in-memory static assets (revalidated by ETag afterwards)
+STATIC_MAX_AGE = int(os.environ.get("MOLTY_STATIC_MAX_AGE", 3600))
+
+# bounded executor for simulations/optimizer; requests beyond workers + queue get a 503
+CPU_WORKERS = int(os.environ.get("MOLTY_CPU_WORKERS", min(4, os.cpu_count() or 1)))
+CPU_QUEUE = int(os.environ.get("MOLTY_CPU_QUEUE", 64))
+
+# Google Drive sync: folder whose children are the customer folders, parallel downloads
+DRIVE_ROOT_ID = os.environ.get("COMMERCIAL_FOLDER_ID", "1zsDeckOseY0gMerBHU8nG0p-qKXDV8bN")
+DRIVE_WORKERS = int(os.environ.get("MOLTY_DRIVE_WORKERS", 8))
+
+# PDF reports: TrueType font (Latin Extended for č/ć/š/ž/đ; core Helvetica if missing), batch render processes
+REPORT_FONT = os.environ.get("MOLTY_REPORT_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+REPORT_WORKERS = int(os.environ.get("MOLTY_REPORT_WORKERS", min(4, os.cpu_count() or 1)))
@@ -0,0 +1,42 @@
+"""SQLite access for molty.db — every module opens connections through here.
+
+The database runs in WAL mode so the API keeps reading while the indexer or a
+bulk ingest writes; synchronous=NORMAL is durable across app crashes in WAL
+(only an OS crash can lose the last commits) and saves an fsync per commit.
+Connections time their statements into molty_sqlite_query_seconds (/metrics).
+"""
+import re, time, sqlite3, functools
+import metrics
+from config import DB_PATH
+
+PRAGMAS = ("PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL", "PRAGMA cache_size=-32000",  # 32 MB page cache
+           "PRAGMA temp_store=MEMORY", "PRAGMA busy_timeout=30000")
+TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|INDEX|TRIGGER)(?:\s+IF\s+(?:NOT\s+)?EXISTS)?\s+(?!ON\b|SET\b)(\w+)", re.I)
+QUERY = metrics.Histogram("molty_sqlite_query_seconds", "SQLite execute()/executemany() time by statement and table (SELECTs: until the first row)",
+                          ["op", "table"], buckets=(.0001, .0005, .001, .0025, .005, .01, .025, .05, .1, .5, 1, 5))
+
+
+@functools.lru_cache(maxsize=1024)
+def _labels(sql):
+    op, table = sql.split(None, 1)[0].upper() if sql.strip() else "", TABLE.search(sql)
+    return {"op": op, "table": table[1].lower() if table else ""}
+
+
+class Connection(sqlite3.Connection):
+    """Times every execute()/executemany() into QUERY."""
+
+    def execute(self, sql, *args):
+        t0 = time.perf_counter()
+        try: return super().execute(sql, *args)
+        finally: QUERY.observe(time.perf_counter() - t0, **_labels(sql))
+
+    def executemany(self, sql, *args):
+        t0 = time.perf_counter()
+        try: return super().executemany(sql, *args)
+        finally: QUERY.observe(time.perf_counter() - t0, **_labels(sql))
+
+
+def connect(path=None, isolation_level="", **kw):
+    conn = sqlite3.connect(path or DB_PATH, timeout=30, isolation_level=isolation_level, factory=Connection, **kw)
+    for p in PRAGMAS: conn.execute(p)
+    return conn
@@ -0,0 +1,273 @@
+"""
+Incremental Google Drive sync (customer folders -> TDS directory / sales_analytics).
+
+The Drive changes page token lives in molty.db (drive_state), so a cron tick
+only asks Drive for what changed since the last run; the folder tree is
+crawled once, on the very first run. Per file we keep the md5 we synced
+(drive_files) — renames and moves cost nothing, and files that failed are
+retried on the next tick without holding the token back.
+
+    TDS / data sheet PDFs   -> TDS_PATH/YYYY_Customer_name.pdf, then tds_index.update_paths
+    .csv / .jsonl exports   -> sales.ingest (file_id defaults to "<drive id>:<row>")
+
+Downloads run in a bounded thread pool (DRIVE_WORKERS). FakeDrive has the
+same surface as GoogleDrive and keeps everything in memory, for tests and
+dry runs.
+
+    python drive_sync.py [--workers N] [--reset]
+"""
+import os, io, re, sys, json, time, base64, hashlib, argparse, itertools, threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import db, sales, tds_index
+from config import TDS_PATH, DRIVE_ROOT_ID, DRIVE_WORKERS
+
+FOLDER = "application/vnd.google-apps.folder"
+FIELDS = "id, name, mimeType, md5Checksum, modifiedTime, parents, trashed"
+TDS_NAME = re.compile(r"TDS|DATA ?SHEET|SPECIFIKACIJA|TEHNI", re.I)
+SCHEMA = ("CREATE TABLE IF NOT EXISTS drive_state (key TEXT PRIMARY KEY, value TEXT)",
+          "CREATE TABLE IF NOT EXISTS drive_files (file_id TEXT PRIMARY KEY, name TEXT, md5 TEXT, kind TEXT, "
+          "local_path TEXT, error TEXT, synced_at REAL)")
+
+
+class GoogleDrive:
+    """Drive v3 through google-api-python-client (service account, read-only)."""
+
+    def __init__(self, key=None):
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+        raw = key or os.environ.get("GOOGLE_SERVICE_ACCOUNT_KEY")
+        if not raw: raise RuntimeError("GOOGLE_SERVICE_ACCOUNT_KEY not configured")
+        try: info = json.loads(base64.b64decode(raw))
+        except ValueError: info = json.loads(raw)
+        self._creds = service_account.Credentials.from_service_account_info(info, scopes=["https://www.googleapis.com/auth/drive.readonly"])
+        self._build, self._local = build, threading.local()
+
+    @property
+    def svc(self):
+        # the httplib2 transport is not thread-safe: one service object per download thread
+        if not hasattr(self._local, "svc"): self._local.svc = self._build("drive", "v3", credentials=self._creds, cache_discovery=False)
+        return self._local.svc
+
+    def start_token(self):
+        return self.svc.changes().getStartPageToken(supportsAllDrives=True).execute()["startPageToken"]
+
+    def changes(self, token):
+        """([{id, removed, file}], next start token) for everything after token."""
+        out = []
+        while True:
+            r = self.svc.changes().list(pageToken=token, pageSize=1000, includeRemoved=True, supportsAllDrives=True,
+                                        includeItemsFromAllDrives=True, fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FIELDS}))").execute()
+            out += [{"id": c["fileId"], "removed": c.get("removed", False), "file": c.get("file")} for c in r.get("changes", [])]
+            if "newStartPageToken" in r: return out, r["newStartPageToken"]
+            token = r["nextPageToken"]
+
+    def list_all(self, root):
+        """Every file and folder below root (the one-off bootstrap crawl)."""
+        out, queue = [], [root]
+        while queue:
+            parent, page = queue.pop(), None
+            while True:
+                r = self.svc.files().list(q=f"'{parent}' in parents and trashed = false", pageSize=1000, pageToken=page, supportsAllDrives=True,
+                                          includeItemsFromAllDrives=True, fields=f"nextPageToken, files({FIELDS})").execute()
+                for f in r.get("files", []):
+                    out.append(f)
+                    if f["mimeType"] == FOLDER: queue.append(f["id"])
+                page = r.get("nextPageToken")
+                if not page: break
+        return out
+
+    def get(self, fid):
+        return self.svc.files().get(fileId=fid, fields=FIELDS, supportsAllDrives=True).execute()
+
+    def download(self, fid):
+        return self.svc.files().get_media(fileId=fid, supportsAllDrives=True).execute()
+
+
+class FakeDrive:
+    """In-memory Drive with the GoogleDrive surface; every put/remove is a change."""
+
+    def __init__(self, root=DRIVE_ROOT_ID):
+        self.root, self.files, self.blobs, self.log = root, {}, {}, []
+        self.downloads, self._ids = 0, itertools.count(1)
+        self.files[root] = {"id": root, "name": "COMMERCIAL", "mimeType": FOLDER, "parents": []}
+
+    def mkdir(self, name, parent=None):
+        fid = f"d{next(self._ids)}"
+        self.files[fid] = {"id": fid, "name": name, "mimeType": FOLDER, "parents": [parent or self.root]}
+        self.log.append(fid)
+        return fid
+
+    def put(self, name, data, parent, modified="2024-01-01T00:00:00Z", fid=None):
+        fid = fid or f"f{next(self._ids)}"
+        self.files[fid] = {"id": fid, "name": name, "mimeType": "application/octet-stream", "parents": [parent],
+                           "md5Checksum": hashlib.md5(data).hexdigest(), "modifiedTime": modified}
+        self.blobs[fid] = data; self.log.append(fid)
+        return fid
+
+    def rename(self, fid, name):
+        self.files[fid] = {**self.files[fid], "name": name}; self.log.append(fid)
+
+    def remove(self, fid):
+        self.files.pop(fid, None); self.blobs.pop(fid, None); self.log.append(fid)
+
+    def start_token(self): return str(len(self.log))
+
+    def changes(self, token):
+        seen = dict.fromkeys(self.log[int(token):])  # Drive reports each file once, in its current state
+        return [{"id": f, "removed": f not in self.files, "file": self.files.get(f)} for f in seen], self.start_token()
+
+    def list_all(self, root):
+        return [f for f in self.files.values() if f["id"] != root]
+
+    def get(self, fid): return self.files[fid]
+
+    def download(self, fid):
+        self.downloads += 1
+        return self.blobs[fid]
+
+
+class Folders:
+    """Folder ancestry with memoisation: is a file below root, and which customer folder holds it."""
+
+    def __init__(self, client, root, known=()):
+        self.client, self.root = client, root
+        self.meta = {f["id"]: (f["name"], (f.get("parents") or [None])[0]) for f in known if f.get("mimeType") == FOLDER}
+
+    def forget(self, fid): self.meta.pop(fid, None)
+
+    def _parent(self, fid):
+        if fid not in self.meta:
+            try: f = self.client.get(fid); self.meta[fid] = (f["name"], (f.get("parents") or [None])[0])
+            except Exception: self.meta[fid] = (None, None)
+        return self.meta[fid]
+
+    def customer(self, f):
+        """Name of the top-level folder below root that contains f; None if f is outside root."""
+        cur = (f.get("parents") or [None])[0]
+        for _ in range(20):
+            if cur is None: return None
+            if cur == self.root: return ""
+            name, parent = self._parent(cur)
+            if parent == self.root: return name
+            cur = parent
+        return None
+
+
+def init_schema(conn):
+    for sql in SCHEMA: conn.execute(sql)
+
+
+def _state(conn, key, value=None):
+    if value is None:
+        row = conn.execute("SELECT value FROM drive_state WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+    conn.execute("INSERT OR REPLACE INTO drive_state VALUES (?, ?)", (key, value))
+
+
+def kind_of(name):
+    low = name.lower()
+    if low.endswith((".csv", ".jsonl")): return "sales"
+    if low.endswith(".pdf") and TDS_NAME.search(name): return "tds"
+    return None
+
+
+def local_name(f, customer):
+    name = f["name"].replace("/", "-").replace(os.sep, "-")
+    if re.match(r"^(?:19|20)\d{2}_", name) or not customer: return name
+    return f"{(f.get('modifiedTime') or '0000')[:4]}_{' '.join(customer.split())}_{name}"
+
+
+def _fetch(client, f, kind, customer, tds_dir):
+    """Download one file -> (local path or None, sales records or None, error)."""
+    try:
+        data = client.download(f["id"])
+        if kind == "sales":
+            recs = [{"file_id": f"{f['id']}:{i}", **r} for i, r in enumerate(sales.records(f["name"], io.StringIO(data.decode("utf-8-sig"), newline="")))]
+            return None, recs, None
+        path = os.path.join(tds_dir, local_name(f, customer))
+        with open(path + ".part", "wb") as out: out.write(data)
+        os.replace(path + ".part", path)  # the watcher sees one complete .pdf appear
+        return path, None, None
+    except Exception as e: return None, None, f"{type(e).__name__}: {e}"[:500]
+
+
+def sync(client, root=DRIVE_ROOT_ID, tds_dir=TDS_PATH, workers=DRIVE_WORKERS):
+    """One sync pass; returns a report. The first pass (no stored token) crawls root once."""
+    t0 = time.perf_counter()
+    with closing(db.connect()) as conn:
+        init_schema(conn)
+        token = _state(conn, "page_token")
+        if token is None:
+            new_token = client.start_token()  # taken before the crawl so changes made during it are not lost
+            listing = client.list_all(root)
+            changes, folders, mode = [{"id": f["id"], "removed": False, "file": f} for f in listing], Folders(client, root, listing), "bootstrap"
+        else:
+            (changes, new_token), folders, mode = client.changes(token), Folders(client, root), "incremental"
+        known = {r[0]: (r[1], r[2], r[3]) for r in conn.execute("SELECT file_id, md5, local_path, error FROM drive_files")}
+        retry = [fid for fid, k in known.items() if k[2]]
+        changes += [{"id": fid, "removed": False, "file": None, "retry": True} for fid in retry if fid not in {c["id"] for c in changes}]
+
+        jobs, removed, skipped = [], [], 0
+        for ch in changes:
+            f = ch["file"]
+            if f is None and ch.get("retry"):
+                try: f = client.get(ch["id"])
+                except Exception: f = None
+            if f and f["mimeType"] == FOLDER: folders.forget(f["id"]); continue
+            customer = folders.customer(f) if f and not ch["removed"] and not f.get("trashed") else None
+            if customer is None:
+                if ch["id"] in known: removed.append(ch["id"])
+                continue
+            kind = kind_of(f["name"])
+            if not kind: skipped += 1; continue
+            prev = known.get(f["id"])
+            if prev and prev[0] == f.get("md5Checksum") and not prev[2]: skipped += 1; continue  # rename / move / touch
+            jobs.append((f, kind, customer))
+
+        with ThreadPoolExecutor(max(1, min(workers, len(jobs) or 1)), thread_name_prefix="drive") as pool:
+            results = list(pool.map(lambda j: _fetch(client, *j, tds_dir), jobs))
+
+        now, rows, tds_paths, recs = time.time(), [], [], []
+        for (f, kind, _), (path, r, err) in zip(jobs, results):
+            rows.append((f["id"], f["name"], None if err else f.get("md5Checksum"), kind, path, err, now))
+            if path: tds_paths.append(path)
+            old = known.get(f["id"], (None, None))[1]
+            if path and old and old != path:  # edited in a later year -> new YYYY_ name; drop the previous copy
+                if os.path.exists(old): os.remove(old)
+                tds_paths.append(old)
+            if r: recs += r
+        for fid in removed:
+            path = known[fid][1]
+            if path and os.path.exists(path): os.remove(path); tds_paths.append(path)
+        # a re-exported or deleted sheet replaces / drops all of its rows
+        # (only once the new copy is in hand: a failed download keeps the old rows until the retry)
+        stale = list(removed) + [f["id"] for (f, kind, _), res in zip(jobs, results) if kind == "sales" and f["id"] in known and not res[2]]
+        # "<fid>:" .. "<fid>;" is exactly the "<fid>:<n>" keys — exact-case, and Drive ids contain "_"
+        if stale: conn.executemany("DELETE FROM sales_analytics WHERE file_id >= ? AND file_id < ?", [(f"{fid}:", f"{fid};") for fid in stale]); conn.commit()
+        ingest = sales.ingest(recs) if recs else None
+        if tds_paths: tds_index.update_paths(tds_paths)
+        conn.executemany("INSERT OR REPLACE INTO drive_files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.executemany("DELETE FROM drive_files WHERE file_id=?", [(fid,) for fid in removed])
+        _state(conn, "page_token", new_token); _state(conn, "last_sync", str(now))
+        conn.commit()
+    return {"mode": mode, "changes": len(changes), "downloaded": sum(1 for r in results if not r[2]), "failed": sum(1 for r in results if r[2]),
+            "skipped": skipped, "removed": len(removed), "tds": len(tds_paths), "sales_rows": ingest["rows"] if ingest else 0,
+            "wall_s": round(time.perf_counter() - t0, 3)}
+
+
+def reset():
+    """Forget the page token and sync state; the next pass crawls from scratch."""
+    with closing(db.connect()) as conn:
+        init_schema(conn)
+        conn.execute("DELETE FROM drive_state"); conn.execute("DELETE FROM drive_files"); conn.commit()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Incremental Google Drive sync")
+    ap.add_argument("--workers", type=int, default=DRIVE_WORKERS)
+    ap.add_argument("--reset", action="store_true", help="drop the stored page token and re-crawl")
+    a = ap.parse_args()
+    if a.reset: reset()
+    json.dump(sync(GoogleDrive(), workers=a.workers), sys.stdout, indent=1)
+    print()
@@ -0,0 +1,81 @@
+"""
+Streaming CSV / XLSX export.
+
+Rows come from generators (a sqlite cursor drained with fetchmany, or numpy
+result columns converted a block at a time) and leave as ~64 kB chunks, so
+memory stays flat from 1k to 1M rows. CSV goes out as it is produced. XLSX
+is a zip whose directory is written last: openpyxl's write-only mode spools
+the sheet rows to a temp file and the finished workbook is streamed from
+disk; sheets roll over at Excel's row limit.
+"""
+import io, re, csv, tempfile, unicodedata
+from urllib.parse import quote
+from contextlib import closing
+from openpyxl import Workbook
+from starlette.responses import StreamingResponse
+import db
+
+CHUNK = 1 << 16
+XLSX_MAX_ROWS = 1_048_575  # + header
+TYPES = {"csv": "text/csv; charset=utf-8", "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
+
+
+def csv_chunks(header, rows):
+    buf = io.StringIO(); w = csv.writer(buf)
+    buf.write("﻿")  # BOM: Excel opens UTF-8 (č, ć, š) correctly
+    w.writerow(header)
+    for row in rows:
+        w.writerow(row)
+        if buf.tell() >= CHUNK: yield buf.getvalue().encode(); buf.seek(0); buf.truncate()
+    yield buf.getvalue().encode()
+
+
+def xlsx_chunks(header, rows, title="data"):
+    wb = Workbook(write_only=True)
+    ws, n, sheets = None, XLSX_MAX_ROWS, 0
+    for row in rows:
+        if n >= XLSX_MAX_ROWS:
+            sheets += 1; ws = wb.create_sheet(title if sheets == 1 else f"{title} {sheets}"); ws.append(header); n = 0
+        ws.append(row); n += 1
+    if ws is None: wb.create_sheet(title).append(header)
+    with tempfile.TemporaryFile() as f:
+        wb.save(f); f.seek(0)
+        yield from iter(lambda: f.read(CHUNK), b"")
+
+
+def disposition(kind, filename):
+    """Content-Disposition value safe for any name: ASCII-folded filename= plus the exact UTF-8 filename*=."""
+    ascii_name = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode().replace('"', "_").replace("\\", "_")
+    return f"{kind}; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def response(fmt, filename, header, rows):
+    chunks = xlsx_chunks(header, rows) if fmt == "xlsx" else csv_chunks(header, rows)
+    return StreamingResponse(chunks, media_type=TYPES[fmt], headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'})
+
+
+SALES_COLS = ("file_id", "client_name", "doc_date", "material_name", "quantity", "total_val")
+
+
+def sales_rows(client=None, material=None, date_from=None, date_to=None, batch=5000):
+    """sales_analytics rows (client/material: prefix, dates ISO inclusive), ordered by date."""
+    conds, args = [], []
+    client, material = (re.sub(r"([\\%_])", r"\\\1", v) if v is not None else None for v in (client, material))  # literal prefixes
+    for sql, v in (("client_name LIKE ? || '%' ESCAPE '\\'", client), ("material_name LIKE ? || '%' ESCAPE '\\'", material),
+                   ("doc_date >= ?", date_from), ("doc_date <= ?", date_to)):
+        if v is not None: conds.append(sql); args.append(v)
+    where = f"WHERE {' AND '.join(conds)}" if conds else ""
+    # the streaming response pulls each chunk on whichever threadpool thread is free
+    with closing(db.connect(check_same_thread=False)) as conn:
+        cur = conn.execute(f"SELECT {', '.join(SALES_COLS)} FROM sales_analytics {where} ORDER BY doc_date, id", args)
+        while True:
+            block = cur.fetchmany(batch)
+            if not block: return
+            yield from block
+
+
+def column_rows(cols, block=10_000):
+    """Rows from equal-length numpy columns, converted to Python a block at a time."""
+    n = len(cols[0]) if cols else 0
+    for i in range(0, n, block):
+        yield from zip(*(c[i:i + block].tolist() for c in cols))
@@ -1,55 +1,260 @@
-import os, math, re, sqlite3, json, io
-from fastapi import FastAPI
+import os, math, json, time, gzip, hashlib, asyncio, threading, traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
-from typing import List
-import PyPDF2
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Union, Optional
+import numpy as np
+import db, tds_index, tds_watch, thermal, cache, static, sales, drive_sync, export, reports, metrics
+from config import TDS_PATH, REBUILD_ON_START, WATCH_TDS, SIM_CACHE_ITEMS, SIM_CACHE_MB, SIM_CACHE_TTL, CPU_WORKERS, CPU_QUEUE
 
 # --- CORE ---
-app = FastAPI()
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
-
-TDS_PATH = "tehnicki_listovi"
 if not os.path.exists(TDS_PATH): os.makedirs(TDS_PATH)
+WATCHER = tds_watch.Watcher(TDS_PATH)
+SIM_CACHE = cache.LRUCache(SIM_CACHE_ITEMS, int(SIM_CACHE_MB * 2**20), SIM_CACHE_TTL)
+STATIC = static.Assets([os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard.html")])
+INIT_CACHE = cache.LRUCache(256, 16 << 20, ttl=3600)  # encoded /api/init bodies per (fields, page), per catalog version
+
+# simulations/optimizer run here, not on uvicorn's threadpool; more than CPU_QUEUE waiting -> 503
+CPU_POOL = ThreadPoolExecutor(CPU_WORKERS, thread_name_prefix="cpu")
+CPU_INFLIGHT = 0
+READY = threading.Event()  # set once the startup catalog build finished
+REFRESH = threading.Lock()  # one on-demand refresh at a time; other requests serve the snapshot
+WARMUP = {"started": None, "finished": None, "report": None, "error": None}
+
+def warm_up():
+    # the server answers from the existing index meanwhile (/api/init says "warming")
+    # MOLTY_REBUILD_ON_START=1: fresh deployment / new corpus drop -> full pooled rebuild
+    WARMUP["started"] = time.time()
+    try:
+        WARMUP["report"] = tds_index.refresh(TDS_PATH, full=REBUILD_ON_START)
+        tds_index.load_materials()
+    except Exception as e: WARMUP["error"] = f"{type(e).__name__}: {e}"; traceback.print_exc()
+    finally: WARMUP["finished"] = time.time(); READY.set()
+    if WATCH_TDS: WATCHER.start()
+
+@asynccontextmanager
+async def lifespan(app):
+    threading.Thread(target=warm_up, name="catalog-warmup", daemon=True).start()
+    yield
+    WATCHER.stop(); CPU_POOL.shutdown(wait=False, cancel_futures=True)
+    if reports._POOL: reports._POOL.shutdown(wait=False, cancel_futures=True)
+
+async def offload(fn, *args):
+    global CPU_INFLIGHT
+    if CPU_INFLIGHT >= CPU_WORKERS + CPU_QUEUE: raise HTTPException(503, "simulation queue full, retry shortly", headers={"Retry-After": "1"})
+    CPU_INFLIGHT += 1
+    try: return await asyncio.get_running_loop().run_in_executor(CPU_POOL, fn, *args)
+    finally: CPU_INFLIGHT -= 1
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(metrics.Instrument)
 
 def init_db():
-    conn = sqlite3.connect("molty.db")
-    conn.execute('CREATE TABLE IF NOT EXISTS sales_analytics (id INTEGER PRIMARY KEY AUTOINCREMENT, file_id TEXT UNIQUE, client_name TEXT, doc_date TEXT, material_name TEXT, quantity REAL, total_val REAL)')
-    conn.close()
+    with closing(db.connect()) as conn:
+        sales.init_schema(conn)
+        tds_index.init_schema(conn)
+        conn.commit()
 
 init_db()
 
 class Layer(BaseModel):
     material: str; thickness: float; lambda_val: float; density: float; price: float
+    cp: float = 1000  # J/kgK, only used by the transient model
 class SimReq(BaseModel):
     metal: str; target_temp: float; ambient_temp: float; layers: List[Layer]
+    nonlinear: bool = False  # λ(T) from the catalog tables instead of the constant lambda_val
+class ReportReq(SimReq):
+    title: Optional[str] = None  # variant name, also the file name inside a batch ZIP
+class ReportBatchReq(BaseModel):
+    variants: List[ReportReq]
+class BatchSimReq(BaseModel):
+    # columnar: one row per scenario, one column per layer (hot face first); ragged rows are zero-padded
+    target_temp: Union[float, List[float]]; ambient_temp: float = 30
+    thickness: List[List[float]]; lambda_val: List[List[float]]; density: List[List[float]]; price: List[List[float]]
+    material: Optional[List[List[str]]] = None; nonlinear: bool = False
+class TransientReq(BaseModel):
+    # heatup: burner curve [[hour, hot-face °C], ...]; hours defaults to the end of the curve
+    layers: List[Layer]; heatup: List[List[float]]; ambient_temp: float = 30; hours: Optional[float] = None
+    dx_mm: float = 2; dt_s: float = 60; drying_temp: float = 110; samples: int = 200
+class SaleRow(BaseModel):
+    file_id: str = Field(min_length=1); client_name: Optional[str] = None; doc_date: Optional[str] = None; material_name: Optional[str] = None
+    quantity: Union[float, str, None] = None; total_val: Union[float, str, None] = None  # "1.234,5" as in the sales exports: parsed by sales._num
+class SalesIngestReq(BaseModel):
+    rows: List[SaleRow]
+class OptLayer(BaseModel):
+    material: str; min_th: float; max_th: float
+class OptReq(BaseModel):
+    # layers hot face first; material names as served by /api/init
+    metal: str; max_shell_temp: float; layers: List[OptLayer]; ambient_temp: float = 30
+    target_temp: Optional[float] = None; budget: int = 100_000; limit: int = 200
 
 # --- TDS LOGIKA ---
+METALS = {"Sivi Liv": 1200, "Nodularni Liv": 1150, "Celik": 1510}
+STEEL_SHELL = {"name": "STEEL SHELL", "density": 7850, "lambda_val": 50.0, "price": 1000}
+
+def sync_catalog():
+    # with the watcher running the index is already current; otherwise diff the directory,
+    # unless the startup build or another request's refresh is still going
+    if READY.is_set() and not WATCHER.alive and REFRESH.acquire(blocking=False):
+        try: tds_index.refresh(TDS_PATH)
+        finally: REFRESH.release()
+
 def get_mats():
-    mats = [{"name": "STEEL SHELL", "density": 7850, "lambda_val": 50.0, "price": 1000}]
-    for file in os.listdir(TDS_PATH):
-        if file.endswith(".pdf"):
-            try:
-                with open(os.path.join(TDS_PATH, file), "rb") as f:
-                    txt = "".join([p.extract_text() or "" for p in PyPDF2.PdfReader(f).pages]).upper()
-                    den = re.search(r"(\d+[.,]?\d*)\s*(KG/M3|G/CM3)", txt)
-                    d_val = float(den.group(1).replace(",", ".")) if den else 2500
-                    if d_val < 100: d_val *= 1000
-                    mats.append({"name": file.replace(".pdf", "").upper(), "density": int(d_val), "lambda_val": 1.4, "price": 950})
-            except: continue
-    return mats
+    sync_catalog()
+    return [STEEL_SHELL] + tds_index.load_materials()
+
+def lambda_grids(names, lambda_vals):
+    """λ(T) grid rows for each distinct (material, lambda_val) plus the (stacks, layers) index into them.
+
+    Materials without a conductivity table fall back to their constant lambda_val.
+    """
+    tables, keys = tds_index.lambda_tables(), {}
+    idx = [[keys.setdefault((n, float(l)), len(keys)) for n, l in zip(nr, lr)] for nr, lr in zip(names, lambda_vals)]
+    return np.stack([thermal.lambda_grid(tables.get(n, ((), ())), l) for n, l in keys]), np.asarray(idx)
+
+def find_mats(names):
+    by_name = {m["name"]: m for m in get_mats()}
+    missing = [n for n in names if n not in by_name]
+    if missing: raise HTTPException(422, f"unknown material(s): {', '.join(missing)}")
+    return [by_name[n] for n in names]
+
+def cached(kind, r, fn):
+    """fn(r) memoised on the canonical request; a catalog version change empties the cache."""
+    SIM_CACHE.bind_version(tds_index.catalog_version())
+    key = kind + ":" + cache.canonical_key(r.model_dump())
+    res = SIM_CACHE.get(key)
+    if res is None: res = fn(r); SIM_CACHE.put(key, res)
+    return res
 
 # --- ROUTES ---
 @app.get("/api/init")
-def init():
-    return {"materials": get_mats(), "metals": {"Sivi Liv": 1200, "Nodularni Liv": 1150, "Celik": 1510}}
+def init(request: Request, fields: Optional[str] = None, limit: Optional[int] = None, offset: int = 0,
+         customer: Optional[str] = None, year: Optional[int] = None):
+    """Catalog for the dashboard; ?fields=name,lambda_val projects, ?limit=&offset= pages,
+    ?customer=&year= serves one plant's partition plus the generic products.
+
+    The ETag follows the catalog version, so a client holding the current
+    catalog gets a bare 304. Bodies are encoded (and gzipped) once per version.
+    Never waits for the startup build: "warming" is true while it runs.
+    """
+    sync_catalog()
+    warming = not READY.is_set()
+    limit, offset = None if limit is None else max(0, limit), max(0, offset)
+    cols = tuple(f for f in fields.split(",") if f) if fields else None
+    if cols and set(cols) - set(tds_index.CATALOG_COLS): raise HTTPException(422, f"fields must be among {', '.join(tds_index.CATALOG_COLS)}")
+    version = tds_index.catalog_version()
+    INIT_CACHE.bind_version(version)
+    params = f"{cols}:{limit}:{offset}:{customer and customer.casefold()}:{year}:{warming}"
+    etag = f'"{version}-{hashlib.blake2b(params.encode(), digest_size=6).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag in request.headers.get("if-none-match", ""): return Response(status_code=304, headers=headers)
+    hit = INIT_CACHE.get(params)
+    if hit is None:
+        if customer is None and year is None: names, mats = None, tds_index.load_materials()
+        else:
+            names, mats = tds_index.partition(customer, year)
+            if not names: raise HTTPException(404, f"no catalog partition for customer {customer!r}")
+        mats = [STEEL_SHELL] + mats
+        page = mats[offset:offset + limit] if limit is not None else mats[offset:]
+        if cols: page = [{c: m.get(c) for c in cols} for m in page]
+        body = json.dumps({"materials": page, "metals": METALS, "total": len(mats), "offset": offset, "catalog_version": version,
+                           "customers": names, "warming": warming},
+                          separators=(",", ":")).encode()
+        hit = (body, gzip.compress(body, 6))
+        INIT_CACHE.put(params, hit, len(hit[0]) + len(hit[1]))
+    if "gzip" in request.headers.get("accept-encoding", ""): return Response(hit[1], media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+    return Response(hit[0], media_type="application/json", headers=headers)
+
+@app.get("/api/catalog/partitions")
+def catalog_partitions():
+    sync_catalog()
+    return tds_index.partitions()
+
+@app.get("/api/materials/search")
+def search_materials(q: str, customer: Optional[str] = None, year: Optional[int] = None, limit: int = 20, offset: int = 0):
+    limit, offset = max(1, min(limit, 100)), max(0, offset)
+    total, hits = tds_index.search(q, customer, year, limit, offset)
+    return {"q": q, "total": total, "limit": limit, "offset": offset, "results": hits}
+
+@app.get("/api/materials/source")
+def material_source(name: str):
+    """The source PDF behind a catalog entry ("sources" in /api/init, "source" in search hits)."""
+    path = tds_index.source_path(name)
+    if not path: raise HTTPException(404, "unknown source")
+    try: body = tds_index.read_source(path)
+    except (OSError, KeyError): raise HTTPException(404, "source no longer on disk")
+    return Response(body, media_type="application/pdf", headers={"Content-Disposition": export.disposition("inline", os.path.basename(name))})
+
+@app.post("/api/sales/ingest")
+def ingest_sales(r: SalesIngestReq):
+    # parsed up front so a bad number is a 422 before any batch is committed
+    try: rows = [sales.to_row(row.model_dump()) for row in r.rows]
+    except ValueError as e: raise HTTPException(422, str(e))
+    return sales.ingest(rows)
+
+@app.get("/api/analytics")
+def sales_analytics(by: str = "client_month", client: Optional[str] = None, material: Optional[str] = None,
+                    month_from: Optional[str] = None, month_to: Optional[str] = None, order: str = "total_val", limit: int = 500, offset: int = 0):
+    if by not in sales.ROLLUPS: raise HTTPException(422, f"by must be one of {', '.join(sales.ROLLUPS)}")
+    rows, totals = sales.analytics(by, client, material, month_from, month_to, order, max(1, min(limit, 10_000)), max(0, offset))
+    return {"by": by, "totals": totals, "rows": rows}
+
+@app.post("/api/admin/drive-sync")
+def sync_drive():
+    # cron entry point: only changes since the stored page token are fetched
+    try: client = drive_sync.GoogleDrive()
+    except (RuntimeError, ImportError, ValueError) as e: raise HTTPException(503, f"Drive not configured: {e}")
+    return drive_sync.sync(client)
+
+@app.get("/api/admin/index")
+def index_stats(): return {**tds_index.summary(), "watcher": WATCHER.summary(), "warmup": WARMUP}
+
+@app.get("/api/admin/static")
+def static_stats(): return STATIC.summary()
+
+@app.get("/api/admin/solver")
+def solver_stats():
+    st = thermal.SOLVER_STATS
+    return {**st, "avg_iterations": round(st["iterations"] / st["stacks"], 2) if st["stacks"] else None}
+
+@app.get("/api/admin/cache")
+def cache_stats(): return SIM_CACHE.stats()
+
+# --- METRICS ---
+@metrics.collector
+def catalog_metrics():
+    s, mats = tds_index.summary(), tds_index.load_materials()
+    return [("molty_catalog_version", "gauge", "Material catalog version (moves on every TDS change)", [({}, s["catalog_version"])]),
+            ("molty_catalog_documents", "gauge", "Indexed TDS documents by state", [({"state": "ok"}, s["documents"] - s["failed"]), ({"state": "failed"}, s["failed"])]),
+            ("molty_catalog_materials", "gauge", "Catalog entries after deduplication", [({}, len(mats))]),
+            ("molty_catalog_warming", "gauge", "1 while the startup catalog build runs", [({}, not READY.is_set())]),
+            ("molty_tds_extract_slowest_seconds", "gauge", f"The {tds_index.SLOWEST_N} slowest documents extracted since start",
+             [({"document": tds_index._source_id(p)}, round(v, 4)) for p, v in sorted(tds_index.SLOWEST.items(), key=lambda kv: -kv[1])])]
+
+@metrics.collector
+def runtime_metrics():
+    caches = {"simulate": SIM_CACHE.stats(), "init": INIT_CACHE.stats()}
+    return [*((f"molty_cache_{k}_total", "counter", f"Result cache {k}", [({"cache": n}, st[k]) for n, st in caches.items()])
+              for k in ("hits", "misses", "evictions", "expired")),
+            ("molty_cache_items", "gauge", "Entries held per result cache", [({"cache": n}, st["items"]) for n, st in caches.items()]),
+            ("molty_cache_bytes", "gauge", "Bytes held per result cache", [({"cache": n}, st["bytes"]) for n, st in caches.items()]),
+            ("molty_cpu_pool_in_flight", "gauge", "Simulation jobs running or queued on the CPU pool", [({}, CPU_INFLIGHT)]),
+            ("molty_cpu_pool_capacity", "gauge", "CPU pool workers + queue slots before 503", [({}, CPU_WORKERS + CPU_QUEUE)]),
+            ("molty_tds_watch_events_total", "counter", "Filesystem events seen by the TDS watcher", [({}, WATCHER.stats["events"])]),
+            ("molty_tds_watch_errors_total", "counter", "TDS watcher batches that failed", [({}, WATCHER.stats["errors"])])]
+
+@app.get("/metrics")
+def prometheus_metrics(): return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.post("/api/simulate")
-def simulate(r: SimReq):
-    total_r = 0.12; tw = 0; tc = 0; bom = []
+async def simulate(r: SimReq): return await offload(cached, "sim", r, _simulate)
+
+def _simulate(r):
+    total_r = thermal.R_SURF; tw = 0; tc = 0; bom = []
     for l in r.layers:
         d_m = l.thickness / 1000
         total_r += d_m / (l.lambda_val or 0.01)
@@ -58,9 +263,116 @@ def simulate(r: SimReq):
         tw += weight; tc += cost
         bom.append({"name": l.material, "th": l.thickness, "w": round(weight, 1), "cost": round(cost, 1)})
     
+    if r.nonlinear and r.layers:
+        lamg, idx = lambda_grids([[l.material for l in r.layers]], [[l.lambda_val for l in r.layers]])
+        temps, q, iters = thermal.steady_nonlinear(np.array([[l.thickness for l in r.layers]]), lamg, r.target_temp, r.ambient_temp, idx=idx)
+        return {"shell_temp": round(float(temps[0, -1]), 1), "total_weight": round(tw, 1), "total_cost": round(tc, 1), "bom": bom,
+                "heat_flux": round(float(q[0]), 1), "interface_temps": np.round(temps[0], 1).tolist(), "iterations": int(iters[0])}
     q = (r.target_temp - r.ambient_temp) / total_r
-    shell_t = r.ambient_temp + (q * 0.12)
+    shell_t = r.ambient_temp + (q * thermal.R_SURF)
     return {"shell_temp": round(shell_t, 1), "total_weight": round(tw, 1), "total_cost": round(tc, 1), "bom": bom}
 
+@app.post("/api/simulate/batch")
+async def simulate_batch(r: BatchSimReq): return await offload(_simulate_batch, r)
+
+def _simulate_batch(r):
+    res, extra = batch_results(r)
+    # JSONResponse directly: jsonable_encoder over 10k-long lists costs more than the simulation
+    return JSONResponse({"n": len(res["shell_temp"]), **{k: np.round(v, 4 if k == "total_r" else 1).tolist() for k, v in res.items()},
+                         **{k: np.round(v, 1).tolist() for k, v in extra.items()}})
+
+def batch_results(r):
+    """({shell_temp, heat_flux, total_r, total_weight, total_cost}, nonlinear extras {interface_temps, iterations}) as arrays."""
+    # padding hides a short row (a missing λ would become 0): every scenario must give each column the same layer count
+    lens = [list(map(len, c)) for c in (r.thickness, r.lambda_val, r.density, r.price) + ((r.material,) if r.nonlinear and r.material else ())]
+    if any(l != lens[0] for l in lens[1:]): raise HTTPException(422, "thickness/lambda_val/density/price (and material) must have the same shape, row by row")
+    cols = [thermal.pad(c) for c in (r.thickness, r.lambda_val, r.density, r.price)]
+    t_hot = np.asarray(r.target_temp, dtype=float)
+    if t_hot.ndim and t_hot.shape[0] != cols[0].shape[0]: raise HTTPException(422, "target_temp list must have one value per scenario")
+    res = thermal.steady_batch(*cols, t_hot, r.ambient_temp)
+    extra = {}
+    if r.nonlinear:
+        if r.material is None or len(r.material) != cols[0].shape[0]: raise HTTPException(422, "nonlinear batch needs one material row per scenario")
+        L = cols[0].shape[1]
+        lamg, idx = lambda_grids([(row + [""] * L)[:L] for row in r.material], cols[1])
+        temps, q, iters = thermal.steady_nonlinear(cols[0], lamg, t_hot, r.ambient_temp, idx=idx)
+        res.update(shell_temp=temps[:, -1], heat_flux=q, total_r=(t_hot - temps[:, -1]) / q + thermal.R_SURF)  # effective R
+        extra = {"interface_temps": temps, "iterations": iters}
+    return res, extra
+
+@app.get("/api/export/sales")
+def export_sales(format: str = "csv", client: Optional[str] = None, material: Optional[str] = None,
+                 date_from: Optional[str] = None, date_to: Optional[str] = None):
+    if format not in export.TYPES: raise HTTPException(422, "format must be csv or xlsx")
+    return export.response(format, "sales", export.SALES_COLS, export.sales_rows(client, material, date_from, date_to))
+
+@app.post("/api/export/simulate/batch")
+async def export_batch(r: BatchSimReq, format: str = "csv"):
+    if format not in export.TYPES: raise HTTPException(422, "format must be csv or xlsx")
+    res, extra = await offload(batch_results, r)
+    keys = ["shell_temp", "heat_flux", "total_r", "total_weight", "total_cost"]
+    cols = [np.arange(len(res["shell_temp"]))] + [np.round(res[k], 4 if k == "total_r" else 1) for k in keys]
+    if extra: keys.append("iterations"); cols.append(extra["iterations"])
+    return export.response(format, "simulation", ["scenario"] + keys, export.column_rows(cols))
+
+def report_spec(r):
+    sim = SimReq.model_validate(r.model_dump(exclude={"title"}))
+    return {"title": r.title, "req": sim.model_dump(), "res": cached("sim", sim, _simulate)}
+
+@app.post("/api/report")
+async def report(r: ReportReq):
+    pdf = await offload(lambda: reports.render(report_spec(r)))
+    return Response(pdf, media_type="application/pdf", headers={"Content-Disposition": export.disposition("inline", reports.filename(0, {"title": r.title}))})
+
+@app.post("/api/report/batch")
+async def report_batch(r: ReportBatchReq):
+    if not 0 < len(r.variants) <= 500: raise HTTPException(422, "1..500 variants per batch")
+    specs = await offload(lambda: [report_spec(v) for v in r.variants])
+    return StreamingResponse(reports.zip_stream(specs), media_type="application/zip",
+                             headers={"Content-Disposition": 'attachment; filename="molty-reports.zip"'})
+
+@app.post("/api/simulate/transient")
+async def simulate_transient(r: TransientReq): return JSONResponse(await offload(cached, "transient", r, _transient))
+
+def _transient(r):
+    if not r.layers or len(r.heatup) < 1 or any(len(p) != 2 for p in r.heatup): raise HTTPException(422, "need layers and a [[hour, temp], ...] heat-up curve")
+    if r.dx_mm <= 0 or r.dt_s <= 0: raise HTTPException(422, "dx_mm and dt_s must be positive")
+    if any(l.thickness <= 0 for l in r.layers): raise HTTPException(422, "every layer needs a positive thickness")
+    hours = r.hours if r.hours is not None else max(p[0] for p in r.heatup)
+    if sum(math.ceil(l.thickness / r.dx_mm) for l in r.layers) * hours * 3600 / r.dt_s > 5e7: raise HTTPException(422, "mesh x steps too large, raise dx_mm or dt_s")
+    t0 = time.perf_counter()
+    times, temps, dried, cells, steps = thermal.transient(
+        [l.thickness for l in r.layers], [l.lambda_val for l in r.layers], [l.density for l in r.layers], [l.cp for l in r.layers],
+        sorted(r.heatup), r.ambient_temp, hours, r.dx_mm, r.dt_s, r.drying_temp, max(2, min(r.samples, 5000)))
+    return {"hours": np.round(times, 3).tolist(), "hot_face": np.round(temps[:, 0], 1).tolist(),
+            "layers": [{"name": l.material, "cold_side": np.round(temps[:, j + 1], 1).tolist(),
+                                     "dried_at_h": None if d is None else round(d, 2)} for j, (l, d) in enumerate(zip(r.layers, dried))],
+                         "shell_temp": np.round(temps[:, -1], 1).tolist(), "cells": cells, "steps": steps,
+                         "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+@app.post("/api/optimize")
+async def optimize(r: OptReq): return await offload(_optimize, r)
+
+def _optimize(r):
+    if r.metal not in METALS and r.target_temp is None: raise HTTPException(422, f"unknown metal: {r.metal}")
+    if not r.layers or any(not 0 <= l.min_th <= l.max_th for l in r.layers): raise HTTPException(422, "need 0 <= min_th <= max_th for every layer")
+    mats = find_mats([l.material for l in r.layers])
+    t0 = time.perf_counter()
+    th, obj, evaluated, feasible = thermal.optimize(
+        [m["lambda_val"] for m in mats], [m["density"] for m in mats], [m["price"] for m in mats],
+        [l.min_th for l in r.layers], [l.max_th for l in r.layers],
+        r.target_temp or METALS[r.metal], r.ambient_temp, r.max_shell_temp, budget=min(r.budget, 1_000_000))
+    # a long front is thinned evenly along the cost axis; cheapest and heaviest-insulated ends stay
+    pick = np.unique(np.linspace(0, len(obj) - 1, min(len(obj), r.limit)).round().astype(int)) if len(obj) else []
+    front = [{"thickness": np.round(th[i], 1).tolist(), "total_cost": round(obj[i, 0], 1), "total_weight": round(obj[i, 1], 1),
+              "shell_temp": round(obj[i, 2], 1)} for i in pick]
+    return {"front": front, "cheapest": front[0] if front else None, "front_size": len(obj),
+            "evaluated": evaluated, "feasible": feasible, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
 @app.get("/", response_class=HTMLResponse)
-def root(): return open("dashboard.html", encoding="utf-8").read()
+async def root(request: Request): return STATIC.response(request, "dashboard.html")
+
+@app.get("/static/{name}")
+async def static_asset(request: Request, name: str):
+    if name not in STATIC: raise HTTPException(404)
+    return STATIC.response(request, name)
@@ -0,0 +1,137 @@
+"""
+Process-local metrics in the Prometheus text exposition format (0.0.4), served on /metrics.
+
+Counters, gauges and histograms live where they are updated (HTTP here,
+SQLite in db, extraction in tds_index) and register themselves; state that
+already exists elsewhere (catalog size, cache counters, the CPU pool) is read
+at scrape time by functions registered with @collector. Instrument is the
+ASGI middleware behind the per-route request metrics: the route label is the
+path template ("/api/materials/source"), never the raw URL, so cardinality
+stays bounded. No prometheus_client: a scrape is a few hundred lines of text.
+"""
+import math, time, bisect, threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+REGISTRY, COLLECTORS = [], []
+
+
+def _num(v):
+    if isinstance(v, bool): return "1" if v else "0"
+    if isinstance(v, int): return str(v)
+    return "+Inf" if v == math.inf else repr(float(v))
+
+
+def _esc(v): return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def family(name, kind, help, samples):
+    """Exposition lines for one metric; samples are (suffix, {label: value}, number)."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for suffix, labels, v in samples:
+        tag = ",".join(f'{k}="{_esc(x)}"' for k, x in labels.items())
+        lines.append(f"{name}{suffix}{{{tag}}} {_num(v)}" if tag else f"{name}{suffix} {_num(v)}")
+    return lines
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values, self._lock = {}, threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels): return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def samples(self):
+        with self._lock: return [("", dict(zip(self.labels, k)), v) for k, v in self._values.items()]
+
+    def render(self): return family(self.name, self.kind, self.help, self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, n=1, **labels):
+        k = self._key(labels)
+        with self._lock: self._values[k] = self._values.get(k, 0) + n
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, n=1, **labels): self.inc(-n, **labels)
+
+    def set(self, v, **labels):
+        with self._lock: self._values[self._key(labels)] = v
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, v, **labels):
+        k, i = self._key(labels), bisect.bisect_left(self.buckets, v)
+        with self._lock:
+            h = self._values.get(k)
+            if h is None: h = self._values[k] = [[0] * (len(self.buckets) + 1), 0.0]  # per-bucket counts, sum
+            h[0][i] += 1; h[1] += v
+
+    def samples(self):
+        with self._lock: snap = [(k, list(c), s) for k, (c, s) in self._values.items()]
+        out = []
+        for k, counts, total in snap:
+            labels, acc = dict(zip(self.labels, k)), 0
+            for le, c in zip(self.buckets + (math.inf,), counts):
+                acc += c; out.append(("_bucket", {**labels, "le": _num(float(le))}, acc))
+            out += [("_sum", labels, total), ("_count", labels, acc)]
+        return out
+
+
+def collector(fn):
+    """Register fn() -> [(name, kind, help, [({labels}, value)])], called on every scrape."""
+    COLLECTORS.append(fn)
+    return fn
+
+
+SCRAPE_ERRORS = Counter("molty_metrics_collector_errors_total", "Collectors that raised during a scrape", ["collector"])
+
+
+def render():
+    lines = []
+    for m in REGISTRY: lines += m.render()
+    for fn in COLLECTORS:
+        try: families = list(fn())
+        except Exception: SCRAPE_ERRORS.inc(collector=fn.__name__); continue
+        for name, kind, help, samples in families: lines += family(name, kind, help, [("", l, v) for l, v in samples])
+    return "\n".join(lines) + "\n"
+
+
+REQUESTS = Counter("molty_http_requests_total", "HTTP requests by route template, method and status", ["route", "method", "status"])
+LATENCY = Histogram("molty_http_request_duration_seconds", "HTTP request latency until the last body byte is sent", ["route", "method"])
+IN_FLIGHT = Gauge("molty_http_requests_in_flight", "HTTP requests being served right now")
+
+
+class Instrument:
+    """ASGI middleware: per-route request counts and latency, in-flight requests."""
+
+    def __init__(self, app): self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http": return await self.app(scope, receive, send)
+        status, t0 = [500], time.perf_counter()
+
+        async def send_status(msg):
+            if msg["type"] == "http.response.start": status[0] = msg["status"]
+            await send(msg)
+        IN_FLIGHT.inc()
+        try: await self.app(scope, receive, send_status)
+        finally:
+            IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")  # set by the router on a match
+            REQUESTS.inc(route=route, method=scope["method"], status=status[0])
+            LATENCY.observe(time.perf_counter() - t0, route=route, method=scope["method"])
@@ -0,0 +1,161 @@
+"""
+PDF engineering sheets for /api/simulate results (fpdf 1.7.2).
+
+One A4 page per lining variant: summary, BOM table, layer bar and the
+temperature profile through the wall. The TrueType metrics are parsed once
+per process and copied into every new document (fpdf would otherwise re-read
+the TTF on each add_font); the page layout is the LAYOUT table below.
+
+render_many() fans a tender's worth of variants out over a spawn process
+pool (the font is loaded in the worker initializer) and zip_stream() yields
+the archive member by member as reports finish.
+"""
+import os, time, zipfile, unicodedata, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import fpdf
+from fpdf import FPDF
+from config import REPORT_FONT, REPORT_WORKERS
+
+fpdf.fpdf.FPDF_CACHE_MODE = 1  # no .pkl next to system fonts; metrics are cached in memory instead
+COLORS = [(31, 111, 235), (63, 185, 80), (240, 136, 62), (137, 87, 229)]  # dashboard layer-bar colors
+LAYOUT = {
+    "margin": 15, "width": 180,
+    "bom": [("Sloj / Layer", 62, "L"), ("mm", 18, "R"), ("λ W/mK", 22, "R"), ("kg/m³", 22, "R"), ("kg/m²", 26, "R"), ("€/m²", 30, "R")],
+    "bar_h": 10, "chart_h": 70,
+}
+_FONT = {}  # family -> (fonts entry, font_files entries) after the first parse
+
+
+class Report(FPDF):
+    def __init__(self):
+        super().__init__("P", "mm", "A4")
+        self.set_auto_page_break(True, LAYOUT["margin"])
+        self.set_margins(LAYOUT["margin"], LAYOUT["margin"])
+        self.family = _font(self)
+
+    def enc(self, s):
+        # core fonts are latin-1 only: fold č -> c etc. when the TTF is unavailable
+        if self.family != "helvetica": return str(s)
+        return unicodedata.normalize("NFKD", str(s)).replace("λ", "lambda").replace("³", "3").replace("²", "2").encode("latin-1", "ignore").decode("latin-1")
+
+    def font(self, size, bold=False):
+        self.set_font(self.family, "B" if bold and self.family == "helvetica" else "", size)
+
+
+def _font(pdf):
+    if not os.path.exists(REPORT_FONT): return "helvetica"
+    if "molty" not in _FONT:
+        pdf.add_font("molty", "", REPORT_FONT, uni=True)
+        _FONT["molty"] = (pdf.fonts["molty"], {k: v for k, v in pdf.font_files.items()})
+        return "molty"
+    entry, files = _FONT["molty"]
+    pdf.fonts["molty"] = {**entry, "i": len(pdf.fonts) + 1, "subset": list(range(32))}  # fresh glyph subset per document
+    pdf.font_files.update(files)
+    return "molty"
+
+
+def profile(req, res):
+    """[(x mm from the hot face, °C)] at every interface: solver temps when present, else the linear model."""
+    xs = [0.0]
+    for l in req["layers"]: xs.append(xs[-1] + l["thickness"])
+    if res.get("interface_temps"): return list(zip(xs, res["interface_temps"]))
+    q = (res["shell_temp"] - req["ambient_temp"]) / 0.12  # R_SURF
+    temps = [req["target_temp"]]
+    for l in req["layers"]: temps.append(temps[-1] - q * l["thickness"] / 1000 / (l["lambda_val"] or 0.01))
+    return list(zip(xs, temps))
+
+
+def render(spec):
+    """PDF bytes for {"title", "req": SimReq dict, "res": /api/simulate result}."""
+    req, res, m, w = spec["req"], spec["res"], LAYOUT["margin"], LAYOUT["width"]
+    pdf = Report(); pdf.add_page(); t = pdf.enc
+    pdf.set_fill_color(13, 17, 23); pdf.rect(0, 0, 210, 28, "F")
+    pdf.set_text_color(255, 255, 255); pdf.font(16, True); pdf.set_xy(m, 8)
+    pdf.cell(w, 8, t(spec.get("title") or "MOLTY — Thermal lining report"))
+    pdf.font(8); pdf.set_xy(m, 17)
+    pdf.cell(w, 5, t(f"{req['metal']}  ·  hot face {req['target_temp']:g} °C  ·  ambient {req['ambient_temp']:g} °C  ·  "
+                     f"{'λ(T) solver' if req.get('nonlinear') else 'constant λ'}  ·  {time.strftime('%Y-%m-%d')}"))
+
+    pdf.set_text_color(0, 0, 0); pdf.set_y(36)
+    stats = [("Shell temp", f"{res['shell_temp']:g} °C"), ("Weight", f"{res['total_weight']:g} kg/m²"), ("Cost", f"{res['total_cost']:,.1f} €/m²")]
+    if "heat_flux" in res: stats.append(("Heat flux", f"{res['heat_flux']:g} W/m²"))
+    for label, val in stats:
+        x = pdf.get_x(); pdf.font(7); pdf.cell(w / len(stats), 4, t(label.upper()), ln=2); pdf.set_x(x)
+        pdf.font(13, True); pdf.cell(w / len(stats), 8, t(val)); pdf.set_xy(x + w / len(stats), 36)
+
+    pdf.set_y(54); pdf.font(8, True); pdf.set_fill_color(230, 234, 240)
+    for name, cw, align in LAYOUT["bom"]: pdf.cell(cw, 6, t(name), 0, 0, align, True)
+    pdf.ln(); pdf.font(8)
+    for l, b in zip(req["layers"], res["bom"]):
+        for v, (_, cw, align) in zip((b["name"], f"{b['th']:g}", f"{l['lambda_val']:g}", f"{l['density']:g}", f"{b['w']:g}", f"{b['cost']:,.1f}"), LAYOUT["bom"]):
+            pdf.cell(cw, 6, t(v)[:48], "B", 0, align)
+        pdf.ln()
+
+    total = sum(l["thickness"] for l in req["layers"]) or 1
+    y = pdf.get_y() + 8; x = m
+    for i, l in enumerate(req["layers"]):
+        lw = w * l["thickness"] / total
+        pdf.set_fill_color(*COLORS[i % len(COLORS)]); pdf.rect(x, y, lw, LAYOUT["bar_h"], "F"); x += lw
+
+    pts, top, h = profile(req, res), y + LAYOUT["bar_h"] + 12, LAYOUT["chart_h"]
+    tmax = max(p[1] for p in pts); tmin = min(req["ambient_temp"], min(p[1] for p in pts))
+    sx = lambda v: m + w * v / total
+    sy = lambda v: top + h - h * (v - tmin) / ((tmax - tmin) or 1)
+    pdf.set_draw_color(160, 160, 160); pdf.rect(m, top, w, h)
+    pdf.font(7)
+    for xv, tv in pts:
+        pdf.line(sx(xv), top, sx(xv), top + h)
+        pdf.set_xy(sx(xv) - 8, sy(tv) - 5); pdf.cell(16, 4, f"{tv:.0f}", 0, 0, "C")
+    pdf.set_draw_color(240, 80, 60); pdf.set_line_width(0.6)
+    for (x0, t0), (x1, t1) in zip(pts, pts[1:]): pdf.line(sx(x0), sy(t0), sx(x1), sy(t1))
+    pdf.set_line_width(0.2); pdf.set_xy(m, top + h + 1); pdf.cell(w, 4, t("Temperature profile through the lining (°C vs mm from hot face)"), 0, 0, "C")
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def _warm():
+    _font(FPDF())
+
+
+_POOL = None
+
+
+def pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=_warm)
+    return _POOL
+
+
+def render_many(specs):
+    """Yield (index, pdf bytes) as the pool finishes them; small batches render inline."""
+    if len(specs) <= 2 or REPORT_WORKERS <= 1:
+        for i, s in enumerate(specs): yield i, render(s)
+        return
+    futures = {pool().submit(render, s): i for i, s in enumerate(specs)}
+    for fut in as_completed(futures): yield futures[fut], fut.result()
+
+
+class _Sink:
+    """Write-only file object for ZipFile; drained after every member."""
+
+    def __init__(self): self.parts = []
+    def write(self, b): self.parts.append(bytes(b)); return len(b)
+    def flush(self): pass
+    def drain(self):
+        out, self.parts = b"".join(self.parts), []
+        return out
+
+
+def filename(i, spec):
+    name = "".join(c if c.isalnum() or c in "-_ " else "_" for c in (spec.get("title") or f"variant {i + 1}")).strip()
+    return f"{i + 1:03d}_{name[:60]}.pdf"
+
+
+def zip_stream(specs):
+    """ZIP of all reports, produced member by member (PDF streams are already deflated -> stored)."""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+        for i, pdf in render_many(specs):
+            zf.writestr(filename(i, specs[i]), pdf)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,156 @@
+"""
+Bulk ingestion into sales_analytics (one row per invoice line / document).
+
+Rows are upserted on file_id in batches: one executemany per batch inside an
+explicit BEGIN IMMEDIATE ... COMMIT, so a 100k-row backfill is a few hundred
+transactions instead of 100k. Re-ingesting the same export only updates the
+rows it touches.
+
+Rollups (client x month, material x month, client x material: rows, quantity,
+value) are kept in sync by triggers on sales_analytics, so every writer —
+ingest, Drive sync, manual SQL — updates them in the same transaction and
+analytics() never scans the fact table. rebuild_rollups() recomputes them
+from scratch (float sums drift slightly under many updates).
+
+    python sales.py FILE [FILE ...] [--batch N]      # .csv (header row) or .jsonl
+    python sales.py --rebuild-rollups
+"""
+import re, csv, sys, json, time, argparse
+from contextlib import closing
+import db
+
+COLS = ("file_id", "client_name", "doc_date", "material_name", "quantity", "total_val")
+BATCH = 5000
+SCHEMA = 'CREATE TABLE IF NOT EXISTS sales_analytics (id INTEGER PRIMARY KEY AUTOINCREMENT, file_id TEXT UNIQUE, client_name TEXT, doc_date TEXT, material_name TEXT, quantity REAL, total_val REAL)'
+INDEXES = ("CREATE INDEX IF NOT EXISTS sales_client ON sales_analytics (client_name)",
+           "CREATE INDEX IF NOT EXISTS sales_date ON sales_analytics (doc_date)",
+           "CREATE INDEX IF NOT EXISTS sales_material ON sales_analytics (material_name)")
+UPSERT = (f"INSERT INTO sales_analytics ({', '.join(COLS)}) VALUES ({', '.join('?' * len(COLS))}) "
+          f"ON CONFLICT(file_id) DO UPDATE SET {', '.join(f'{c}=excluded.{c}' for c in COLS[1:])}")
+DATE = re.compile(r"^(\d{1,2})\.(\d{1,2})\.(\d{4})\.?$")  # 20.06.2011 -> 2011-06-20
+
+# rollup -> (key column, SQL for it over a sales_analytics row); NULL keys roll up under ''
+KEYS = {"client_name": "COALESCE({r}.client_name, '')", "material_name": "COALESCE({r}.material_name, '')",
+        "month": "COALESCE(substr({r}.doc_date, 1, 7), '')"}
+ROLLUPS = {"client_month": ("client_name", "month"), "material_month": ("material_name", "month"),
+           "client_material": ("client_name", "material_name")}
+
+
+def _rollup_sql(name, keys):
+    t, (a, b) = f"sales_{name}", keys
+    ka, kb = KEYS[a], KEYS[b]
+    add = (f"INSERT INTO {t} VALUES ({ka.format(r='NEW')}, {kb.format(r='NEW')}, 1, COALESCE(NEW.quantity, 0), COALESCE(NEW.total_val, 0)) "
+           f"ON CONFLICT({a}, {b}) DO UPDATE SET n = n + 1, quantity = quantity + excluded.quantity, total_val = total_val + excluded.total_val;")
+    where = f"{a} = {ka.format(r='OLD')} AND {b} = {kb.format(r='OLD')}"
+    sub = (f"UPDATE {t} SET n = n - 1, quantity = quantity - COALESCE(OLD.quantity, 0), total_val = total_val - COALESCE(OLD.total_val, 0) WHERE {where}; "
+           f"DELETE FROM {t} WHERE {where} AND n <= 0;")
+    return (f"CREATE TABLE IF NOT EXISTS {t} ({a} TEXT, {b} TEXT, n INTEGER, quantity REAL, total_val REAL, PRIMARY KEY ({a}, {b})) WITHOUT ROWID",
+            f"CREATE TRIGGER IF NOT EXISTS {t}_ins AFTER INSERT ON sales_analytics BEGIN {add} END",
+            f"CREATE TRIGGER IF NOT EXISTS {t}_del AFTER DELETE ON sales_analytics BEGIN {sub} END",
+            f"CREATE TRIGGER IF NOT EXISTS {t}_upd AFTER UPDATE ON sales_analytics BEGIN {sub} {add} END")
+
+
+def init_schema(conn):
+    conn.execute(SCHEMA)
+    for sql in INDEXES: conn.execute(sql)
+    have = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for name, keys in ROLLUPS.items():
+        for sql in _rollup_sql(name, keys): conn.execute(sql)
+        if f"sales_{name}" not in have: _fill(conn, name)  # rollup added to an existing table
+
+
+def _fill(conn, name):
+    a, b = ROLLUPS[name]
+    conn.execute(f"DELETE FROM sales_{name}")
+    conn.execute(f"INSERT INTO sales_{name} SELECT {KEYS[a].format(r='s')}, {KEYS[b].format(r='s')}, COUNT(*), "
+                 f"TOTAL(quantity), TOTAL(total_val) FROM sales_analytics s GROUP BY 1, 2")
+
+
+def rebuild_rollups(path=None):
+    with closing(db.connect(path)) as conn:
+        init_schema(conn)
+        for name in ROLLUPS: _fill(conn, name)
+        conn.commit()
+
+
+def analytics(by, client=None, material=None, month_from=None, month_to=None, order="total_val", limit=500, offset=0):
+    """Rows of one rollup, filtered (client/material: case-insensitive prefix; months 'YYYY-MM', inclusive).
+
+    Returns (page, totals over all matching rows).
+    """
+    a, b = ROLLUPS[by]
+    conds, args = [], []
+    for col, v in (("client_name", client), ("material_name", material)):  # a literal prefix, not a LIKE pattern
+        if v is not None and col in (a, b): conds.append(f"{col} LIKE ? || '%' ESCAPE '\\'"); args.append(re.sub(r"([\\%_])", r"\\\1", v))
+    if month_from and "month" in (a, b): conds.append("month >= ?"); args.append(month_from)
+    if month_to and "month" in (a, b): conds.append("month <= ?"); args.append(month_to)
+    where = f"WHERE {' AND '.join(conds)}" if conds else ""
+    order = {"total_val": "total_val DESC", "quantity": "quantity DESC", "n": "n DESC"}.get(order, f"{a}, {b}")
+    with closing(db.connect()) as conn:
+        rows = conn.execute(f"SELECT {a}, {b}, n, quantity, total_val FROM sales_{by} {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                            (*args, limit, offset)).fetchall()
+        tot = conn.execute(f"SELECT COUNT(*), TOTAL(n), TOTAL(quantity), TOTAL(total_val) FROM sales_{by} {where}", args).fetchone()
+    keys = (a, b, "rows", "quantity", "total_val")
+    return [dict(zip(keys, r)) for r in rows], {"groups": tot[0], "rows": int(tot[1]), "quantity": tot[2], "total_val": tot[3]}
+
+
+def _num(v):
+    if v is None or v == "": return None
+    return float(v.replace(".", "").replace(",", ".") if isinstance(v, str) and "," in v else v)
+
+
+def _date(v):
+    m = DATE.match(v.strip()) if isinstance(v, str) else None
+    return f"{m[3]}-{int(m[2]):02d}-{int(m[1]):02d}" if m else v
+
+
+def to_row(rec):
+    """dict (or sequence in COLS order) -> parameter tuple; file_id is required."""
+    if not isinstance(rec, dict): rec = dict(zip(COLS, rec))
+    if not rec.get("file_id"): raise ValueError(f"row without file_id: {rec}")
+    return (str(rec["file_id"]), rec.get("client_name"), _date(rec.get("doc_date")), rec.get("material_name"),
+            _num(rec.get("quantity")), _num(rec.get("total_val")))
+
+
+def ingest(records, batch=BATCH, path=None):
+    """Upsert an iterable of records; returns {rows, batches, changes, wall_s, rows_per_s}."""
+    t0, rows, batches = time.perf_counter(), 0, 0
+    with closing(db.connect(path, isolation_level=None)) as conn:
+        init_schema(conn)
+        changes, buf = 0, []  # rowcount, not total_changes: the rollup triggers' writes are not ingested rows
+        for rec in records:
+            buf.append(to_row(rec))
+            if len(buf) >= batch: changes += _flush(conn, buf); rows += len(buf); batches += 1; buf = []
+        if buf: changes += _flush(conn, buf); rows += len(buf); batches += 1
+    wall = time.perf_counter() - t0
+    return {"rows": rows, "batches": batches, "changes": changes, "wall_s": round(wall, 3), "rows_per_s": round(rows / wall) if rows else None}
+
+
+def _flush(conn, buf):
+    conn.execute("BEGIN IMMEDIATE")
+    try: n = conn.executemany(UPSERT, buf).rowcount; conn.execute("COMMIT")
+    except BaseException: conn.execute("ROLLBACK"); raise
+    return n
+
+
+def read_file(path):
+    """Records from a .csv with a header row or a .jsonl file."""
+    with open(path, newline="", encoding="utf-8-sig") as f: yield from records(path, f)
+
+
+def records(name, lines):
+    """Records from an open text stream; the format follows the name (.jsonl, else CSV)."""
+    if name.endswith(".jsonl"): yield from (json.loads(l) for l in lines if l.strip())
+    else: yield from csv.DictReader(lines)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Bulk upsert sales rows into sales_analytics")
+    ap.add_argument("files", nargs="*")
+    ap.add_argument("--batch", type=int, default=BATCH)
+    ap.add_argument("--rebuild-rollups", action="store_true", help="recompute the rollup tables from sales_analytics")
+    a = ap.parse_args()
+    if a.rebuild_rollups: rebuild_rollups()
+    if a.files:
+        json.dump(ingest((r for p in a.files for r in read_file(p)), a.batch), sys.stdout, indent=1)
+        print()
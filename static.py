@@ -0,0 +1,65 @@
+"""
+In-memory static assets (the dashboard shell and anything registered next to it).
+
+Each file is read once, gzip (and brotli, when the optional `brotli` package
+is installed) versions are built up front, and a strong ETag is taken from
+the content hash. Serving is a dict lookup plus a header check; the file is
+re-stat'ed at most every CHECK_S seconds and reloaded when its mtime moves.
+"""
+import os, gzip, time, hashlib, mimetypes
+from starlette.responses import Response
+from config import STATIC_MAX_AGE
+
+try: import brotli
+except ImportError: brotli = None
+
+CHECK_S = 1.0
+
+
+class Asset:
+    __slots__ = ("path", "mtime", "checked", "etag", "ctype", "bodies")
+
+    def __init__(self, path):
+        self.path, self.mtime = path, None
+        self.ctype = (mimetypes.guess_type(path)[0] or "application/octet-stream") + "; charset=utf-8"
+        self.load()
+
+    def load(self):
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, "rb") as f: raw = f.read()
+        bodies = {"br": brotli.compress(raw, quality=11)} if brotli else {}
+        bodies.update(gzip=gzip.compress(raw, 9), identity=raw)
+        self.bodies, self.mtime, self.checked = bodies, mtime, time.monotonic()
+        self.etag = f'"{hashlib.blake2b(raw, digest_size=12).hexdigest()}"'
+
+    def fresh(self):
+        now = time.monotonic()
+        if now - self.checked >= CHECK_S:
+            self.checked = now
+            try:
+                if os.stat(self.path).st_mtime != self.mtime: self.load()
+            except OSError: pass  # mid-replace / gone: keep serving the last good copy
+        return self
+
+
+class Assets:
+    def __init__(self, paths=(), max_age=STATIC_MAX_AGE):
+        self.max_age, self._assets = max_age, {}
+        for p in paths: self.add(p)
+
+    def add(self, path, name=None):
+        self._assets[name or os.path.basename(path)] = Asset(path)
+
+    def __contains__(self, name): return name in self._assets
+
+    def response(self, request, name):
+        a = self._assets[name].fresh()
+        headers = {"ETag": a.etag, "Cache-Control": f"public, max-age={self.max_age}", "Vary": "Accept-Encoding"}
+        if a.etag in request.headers.get("if-none-match", ""): return Response(status_code=304, headers=headers)
+        accept = request.headers.get("accept-encoding", "")
+        enc = "br" if "br" in accept and "br" in a.bodies else "gzip" if "gzip" in accept else "identity"
+        if enc != "identity": headers["Content-Encoding"] = enc
+        return Response(a.bodies[enc], media_type=a.ctype, headers=headers)
+
+    def summary(self):
+        return {n: {"etag": a.etag, "mtime": a.mtime, **{e: len(b) for e, b in a.bodies.items()}} for n, a in self._assets.items()}
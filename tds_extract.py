@@ -0,0 +1,157 @@
+"""
+Thermal-property extraction from TDS text.
+
+The page text is normalized once (case, decimal commas, split units and
+formulas) and then scanned with ONE compiled alternation regex — each named
+branch feeds one property. Per material we keep:
+
+    density      bulk density after firing (kg/m3), else after drying, else any density
+    max_temp     maximum recommended / service temperature (°C)
+    ccs          cold crushing strength after firing (MPa), else after drying
+    chem         main oxides {"AL2O3": 57.0, ...} (%)
+    lambda_t     λ(T) table as two float32 arrays (°C, W/mK), sorted by temperature
+
+lambda_t is stored packed (pack_table) so the simulator can interpolate
+λ(T) (lambda_at) without touching the text again.
+
+PDFs are read page by page (extract_pdf) and reading stops as soon as every
+property above has been seen, or after TDS_MAX_PAGES pages — cost follows
+the properties we need, not the length of a scanned spec bundle. The
+normalized text of the pages that were read comes back as "text" for the
+full-text index; pages after the early exit are not part of it.
+"""
+import re, bisect
+from array import array
+import PyPDF2
+from config import TDS_MAX_PAGES
+
+DEFAULT_DENSITY = 2500
+DEFAULT_LAMBDA = 1.4
+LAMBDA_REF_T = 800  # °C at which the scalar lambda_val is quoted from the table
+
+OXIDES = "AL2O3|SIO2|FE2O3|CAO|MGO|TIO2|K2O|NA2O|CR2O3|ZRO2|SIC|P2O5"
+STD = r"(?:(?:EN ISO|EN|ISO|DIN|ASTM) ?[A-Z]?[\d:-]+ |CALD ?\d+ )?"  # test standard column
+NUM = r"\d+(?:\.\d+)?"
+
+_NORMALIZE = [
+    (re.compile(r"(?<=\d),(?=\d)"), "."),
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"°\s?C"), "°C"),
+    (re.compile(r"W\s?/\s?M\s?\.?\s?K"), "W/MK"),
+    (re.compile(r"(KG|G|T)\s?/\s?(C?M)\s?[3³]"), r"\1/\g<2>3"),
+    (re.compile(r"\b(AL|SI|FE|CA|MG|TI|K|NA|CR|ZR|P) ?(\d?) ?O(?: ?(\d))?\b"), r"\1\2O\3"),
+    # some Quick-FDS exports glue the standard's part number onto the value: "1927- 62.30" -> "1927-6 2.30"
+    (re.compile(r"\b(1927|1402)- ?(\d)(?=\d)"), r"\1-\2 "),
+    (re.compile(r"\b(\d) (\d{3}) ?°C"), r"\1\2°C"),  # "1 500 °C"
+]
+
+PATTERN = re.compile("|".join([
+    # λ row: "AT A MEAN TEMPERATURE OF 800 °C EN ISO 1927-8 1.61 W/MK" / "200°C 0.18 W/MK"
+    rf"(?P<lt>\d{{2,4}}) ?°C {STD}?(?P<lv>{NUM})(?: {NUM})? ?W/MK",
+    rf"MAX(?:IMUM|\.)? ?(?:RECOMMENDED|SERVICE|APPLICATION|USE)? ?TEMP(?:ERATURE|\.)? ?:? ?(?P<mt>\d{{3,4}}) ?°C",
+    # "AFTER FIRING AT 800 °C EN ISO 1927-6 2.45 G/CM3" — unit decides density / CCS
+    rf"AFTER (?P<ast>DRYING|FIRING) AT (?P<at>\d{{2,4}}) ?°C {STD}?(?P<av>{NUM})(?: {NUM})? ?(?P<au>G/CM3|KG/M3|MPA|N/MM2)",
+    rf"CRUSHING STRENGTH(?: ?\([^)]*\))?[^0-9]{{0,40}}?(?P<cv>{NUM}) ?(?:MPA|N/MM2)",
+    # oxide header row followed by a row of percentages (brick sheets)
+    rf"(?P<oxrow>(?:(?:{OXIDES}) ){{2,}}(?:{OXIDES})) (?P<pcts>(?:{NUM} ?% ?){{2,}})",
+    rf"\b(?P<ox>{OXIDES}) ?{STD}?(?P<ov>{NUM}) ?%",
+    rf"(?P<dv>{NUM}) ?(?P<du>KG/M3|G/CM3)",
+]))
+
+
+def normalize(text):
+    text = text.upper()
+    for rx, sub in _NORMALIZE: text = rx.sub(sub, text)
+    return text
+
+
+def _kg_m3(v, unit):
+    return v * 1000 if unit == "G/CM3" or v < 100 else v
+
+
+class Props:
+    """Accumulates matches over one or more chunks of normalized text."""
+
+    def __init__(self):
+        self.lam, self.chem = {}, {}
+        self.max_temp = self.fired = self.dried = self.density = None
+        self.ccs_fired = self.ccs_dried = self.ccs = None
+
+    @property
+    def complete(self):
+        return bool(self.lam and self.chem and self.max_temp and (self.fired or self.dried) and (self.ccs_fired or self.ccs_dried))
+
+    def feed(self, text):
+        for m in PATTERN.finditer(text):
+            g = m.lastgroup
+            if g == "lv":
+                t, v = float(m["lt"]), float(m["lv"])
+                if 0 < v < 60: self.lam.setdefault(t, v)
+            elif g == "mt": self.max_temp = self.max_temp or float(m["mt"])
+            elif g == "au":
+                v, unit, fired = float(m["av"]), m["au"], m["ast"] == "FIRING"
+                if unit in ("MPA", "N/MM2"):
+                    if fired: self.ccs_fired = self.ccs_fired or v
+                    else: self.ccs_dried = self.ccs_dried or v
+                elif fired: self.fired = self.fired or _kg_m3(v, unit)
+                else: self.dried = self.dried or _kg_m3(v, unit)
+            elif g == "cv": self.ccs = self.ccs or float(m["cv"])
+            elif g == "pcts":
+                for ox, pct in zip(m["oxrow"].split(), re.findall(NUM, m["pcts"])): self.chem.setdefault(ox, float(pct))
+            elif g == "ov": self.chem.setdefault(m["ox"], float(m["ov"]))
+            elif g == "du": self.density = self.density or _kg_m3(float(m["dv"]), m["du"])
+        return self
+
+    def result(self):
+        temps = sorted(self.lam)
+        lams = [self.lam[t] for t in temps]
+        density = self.fired or self.dried or self.density or DEFAULT_DENSITY
+        return {"density": int(density), "max_temp": self.max_temp, "ccs": self.ccs_fired or self.ccs_dried or self.ccs,
+                "chem": self.chem, "lambda_t": (temps, lams),
+                "lambda_val": round(lambda_at((temps, lams), LAMBDA_REF_T), 3) if temps else DEFAULT_LAMBDA}
+
+
+def extract_props(text):
+    return Props().feed(normalize(text)).result()
+
+
+TAIL = 160  # chars of the previous page re-scanned so a row split across pages still matches
+
+
+def iter_pages(reader, max_pages=TDS_MAX_PAGES):
+    """Normalized text of one page at a time; pages past max_pages are never parsed."""
+    for i, page in enumerate(reader.pages):
+        if i >= max_pages: return
+        yield normalize(page.extract_text() or "")
+
+
+def extract_pdf(stream, max_pages=TDS_MAX_PAGES):
+    """Properties from a PDF stream, stopping at the first page where everything is known."""
+    props, tail, pages = Props(), "", []
+    for text in iter_pages(PyPDF2.PdfReader(stream), max_pages):
+        props.feed(tail + " " + text); pages.append(text)
+        if props.complete: break
+        tail = text[-TAIL:]
+    return {**props.result(), "text": " ".join(pages)}
+
+
+def pack_table(table):
+    temps, lams = table
+    return array("f", list(temps) + list(lams)).tobytes() if temps else None
+
+
+def unpack_table(blob):
+    if not blob: return ((), ())
+    a = array("f"); a.frombytes(blob); n = len(a) // 2
+    return tuple(a[:n]), tuple(round(v, 4) for v in a[n:])
+
+
+def lambda_at(table, t):
+    """Linear interpolation of λ(T), clamped to the end points of the table."""
+    temps, lams = table
+    if not temps: return DEFAULT_LAMBDA
+    i = bisect.bisect_left(temps, t)
+    if i == 0: return lams[0]
+    if i == len(temps): return lams[-1]
+    t0, t1 = temps[i - 1], temps[i]
+    return lams[i - 1] + (lams[i] - lams[i - 1]) * (t - t0) / (t1 - t0)
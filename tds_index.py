@@ -0,0 +1,585 @@
+"""
+Persistent TDS material index (molty.db -> tds_index).
+
+Every PDF in TDS_PATH is keyed by path, size, mtime and sha256. refresh() only
+stats the directory; files whose size/mtime moved are re-hashed, and only files
+whose content really changed are run through PyPDF2 again. /api/init reads the
+materials straight from the table; the thermal properties come from
+tds_extract, with the λ(T) table stored packed so nothing re-reads text.
+The extracted text goes into an FTS5 table (tds_fts, rowid = tds_index
+rowid) behind search(); year and customer come from the
+"YYYY_Customer_..." file name convention.
+
+ZIP archives in the directory are sources too: every PDF member is indexed
+as "archive.zip::member.pdf" and read from memory, never unpacked to disk.
+Members are diffed on the central directory alone — the CRC32 (with the
+size) stands in for sha256 — so an unchanged member is never decompressed.
+
+Extraction is CPU-bound pure Python, so large batches (cold builds, a fresh
+corpus drop) are spread over a process pool; each file runs under its own
+timeout so one broken scan cannot stall the batch.
+
+Identical documents are parsed once: a batch is deduplicated on sha256
+before extraction and earlier results are copied by hash (reuse). The
+catalog itself is keyed by canonical_key — trademark signs, document
+markers ("TDS", "MSDS", language tags, revision dates) and the
+"YYYY_Customer_" prefix stripped — so every product is one entry listing
+all of its source files. The catalog is also partitioned by the customer
+and year of those files (partition()), so one plant's dashboard loads its
+own products plus the generic ones instead of everything.
+
+Memory: files are handed to PyPDF2 as read-only mmaps (page cache, not a
+Python copy), the parent only keeps INDEX_MEM_MB worth of documents
+(file size x MEM_FACTOR) in flight across all workers, and workers are
+recycled every INDEX_MAX_TASKS chunks. Per-document and peak RSS end up in
+the run report.
+
+    python tds_index.py [--root DIR] [--workers N] [--chunksize N] [--timeout S] [--mem-mb MB] [--full]
+"""
+import gc, io, os, re, sys, json, math, mmap, time, signal, hashlib, zipfile, argparse, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+import db, metrics, tds_extract
+from config import TDS_PATH, INDEX_WORKERS, INDEX_CHUNKSIZE, INDEX_TIMEOUT, INDEX_MEM_MB, INDEX_MAX_TASKS
+try: import resource
+except ImportError: resource = None
+
+DEFAULT_PRICE = 950
+MEM_FACTOR = 4  # PyPDF2's object graph peaks at roughly 4x the file size
+
+# bump when the table layout or the extraction changes -> the index is rebuilt from scratch
+INDEX_VERSION = 5
+SCHEMA = """CREATE TABLE IF NOT EXISTS tds_index (
+    path TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT,
+    name TEXT, density INTEGER, lambda_val REAL, price REAL,
+    max_temp REAL, ccs REAL, chem TEXT, lambda_t BLOB,
+    year INTEGER, customer TEXT,
+    error TEXT, indexed_at REAL)"""
+FTS_SCHEMA = """CREATE VIRTUAL TABLE IF NOT EXISTS tds_fts USING fts5(
+    name, customer, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"""
+VERSION_TTL = 1.0  # s an in-memory catalog version is trusted before catalog_meta is read again
+_VERSION = [0, -math.inf]  # [version, monotonic time it was read]
+SOURCE = re.compile(r"^((?:19|20)\d{2})_([^_]+)_")  # "9909_calde_..." is a product code, not a year
+SEP = "::"  # archive path / member name
+MAT_COLS = ("name", "density", "lambda_val", "price", "max_temp", "ccs", "chem", "lambda_t")
+CATALOG_COLS = MAT_COLS + ("key", "sources")
+# document-type / language / copy markers and dates that are not part of a product name
+NOISE = re.compile(r"^SD |\b(?:M?SDS\d*|TDSH?|STL|ENU?|ENG|GB|FR|DE|HR|SRP?|ANNOTATED|COPY|FINAL|NEW|COMPRESSED|\d{1,2}[.-]\d{1,2}[.-]\d{2,4})\b|\(\s*\d*\s*\)|[®™©]")
+META_SCHEMA = "CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER)"
+
+# cold = first build into an empty index, warm = nothing had to be re-extracted
+STATS = {"runs": 0, "cold_ms": None, "warm_ms": None, "last": None, "last_rebuild": None, "last_memory": None}
+EXTRACT_SECONDS = metrics.Histogram("molty_tds_extract_seconds", "Per-document PDF extraction time",
+                                    buckets=(.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60))
+EXTRACTED = metrics.Counter("molty_tds_extract_total", "Documents extracted, by result (ok, timeout, worker_died or the exception type)", ["result"])
+SLOWEST = {}  # path -> seconds of the slowest documents extracted so far (SLOWEST_N kept)
+SLOWEST_N = 10
+
+
+def init_schema(conn):
+    conn.execute(META_SCHEMA)
+    row = conn.execute("SELECT value FROM catalog_meta WHERE key='index_version'").fetchone()
+    if not row or row[0] != INDEX_VERSION:
+        conn.execute("DROP TABLE IF EXISTS tds_index"); conn.execute("DROP TABLE IF EXISTS tds_fts")
+        conn.execute("INSERT OR REPLACE INTO catalog_meta VALUES ('index_version', ?)", (INDEX_VERSION,))
+        _bump(conn)
+    conn.execute(SCHEMA); conn.execute(FTS_SCHEMA)
+    conn.execute("CREATE INDEX IF NOT EXISTS tds_index_source ON tds_index (customer, year)")
+
+
+def file_hash(path, bufsize=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(bufsize), b""): h.update(chunk)
+    return h.hexdigest()
+
+
+def extract(path):
+    with _open(path) as f:
+        return {"name": _material_name(path), "price": DEFAULT_PRICE, **tds_extract.extract_pdf(f)}
+
+
+def _split(path):
+    """"a.zip::dir/m.pdf" -> ("a.zip", "dir/m.pdf"); a plain file -> (path, None)."""
+    zpath, sep, member = path.partition(SEP)
+    return (zpath, member) if sep else (path, None)
+
+
+def _open(path):
+    zpath, member = _split(path)
+    if member is None:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0: return io.BytesIO()
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # PyPDF2 seeks back and forth; a deflate stream would re-decompress on every backward seek
+    with zipfile.ZipFile(zpath) as zf: return io.BytesIO(zf.read(member))
+
+
+def zip_keys(zpath):
+    """(path, size, mtime, content key) per PDF member from the central directory; None if the archive is unreadable."""
+    try:
+        with zipfile.ZipFile(zpath) as zf: infos = zf.infolist()
+    except (OSError, zipfile.BadZipFile): return None
+    return [(f"{zpath}{SEP}{i.filename}", i.file_size, time.mktime(i.date_time + (0, 0, -1)), f"crc32:{i.CRC:08x}:{i.file_size}")
+            for i in infos if i.filename.lower().endswith(".pdf") and not i.is_dir()
+            and "__MACOSX/" not in i.filename and not os.path.basename(i.filename).startswith("._")]
+
+
+def _diff_member(key, k, todo, touched):
+    if not k or k[2] != key[3]: todo.append(key)
+    elif (k[0], k[1]) != key[1:3]: touched.append(key)
+
+
+def _members(conn, zpath):
+    return {r[0]: r[1:] for r in conn.execute("SELECT path, size, mtime, sha256 FROM tds_index WHERE path >= ? AND path < ?",
+                                              (zpath + SEP, zpath + SEP + "\U0010ffff"))}
+
+
+def _to_row(mat):
+    mat = mat or {}
+    chem, table = mat.get("chem"), mat.get("lambda_t")
+    return (*(mat.get(c) for c in MAT_COLS[:6]), json.dumps(chem) if chem else None, tds_extract.pack_table(table) if table else None)
+
+
+def _from_row(row):
+    mat = dict(zip(MAT_COLS, row))
+    mat["chem"] = json.loads(mat["chem"]) if mat["chem"] else {}
+    mat["lambda_t"] = tds_extract.unpack_table(mat["lambda_t"])
+    return mat
+
+
+def extract_one(path):
+    """extract() that never raises: (material, None) or (None, error text)."""
+    try: return extract(path), None
+    except Exception as e: return None, f"{type(e).__name__}: {e}"[:500]
+
+
+def _material_name(path):
+    return os.path.basename(_split(path)[1] or path).replace(".pdf", "").upper()
+
+
+def canonical_name(path):
+    """Product name without prefix, trademarks, document markers or revision suffix.
+
+    "2017_Ferro Preis_STL (MSDS) CALDE® PLAST P 85.pdf" -> "CALDE PLAST P 85",
+    "calde_cast_lx_58__mal50069_en_tds_2013-11-19_11_en.pdf" -> "CALDE CAST LX 58".
+    """
+    stem = SOURCE.sub("", re.sub(r"\.pdf$", "", os.path.basename(_split(path)[1] or path), flags=re.I)).upper()
+    name = NOISE.sub(" ", stem.split("__")[0].replace("_", " "))
+    name = " ".join(re.sub(r"\(\s*\)|[^\w%+.,/-]+", " ", name).strip(" -.,").split())
+    return name or " ".join(stem.replace("_", " ").split()) or _material_name(path)  # only markers ("2016_Samot Darosava_TDS.pdf") -> "TDS"
+
+
+def canonical_key(path):
+    """Catalog key: canonical_name with spacing and punctuation dropped ("LX58" == "LX 58", "A-35" == "A 35")."""
+    return re.sub(r"[^A-Z0-9%+]", "", canonical_name(path).upper()) or _material_name(path)
+
+
+def _source_id(path):
+    """Path relative to the TDS directory, as published in a catalog entry's sources."""
+    zpath, member = _split(path)
+    return os.path.basename(zpath) + (SEP + member if member else "")
+
+
+def _source(path):
+    """(year, customer) from "2014_Novoterm plus Arandjelovac_TDS ....pdf", else (None, None)."""
+    m = SOURCE.match(os.path.basename(_split(path)[0]))
+    return (int(m[1]), " ".join(m[2].split())) if m else (None, None)
+
+
+def _diff(path, k, todo, touched):
+    """Sort one file into todo/touched against its index row k=(size, mtime, sha256); False if it is gone."""
+    try:
+        st = os.stat(path)
+        if k and k[0] == st.st_size and k[1] == st.st_mtime: return True
+        key = (path, st.st_size, st.st_mtime, file_hash(path))
+    except OSError: return False
+    (touched if k and k[2] == key[3] else todo).append(key)
+    return True
+
+
+def plan(conn, root=TDS_PATH, full=False):
+    """Diff the directory against the index (full=True: treat every file as changed).
+
+    Returns (todo, touched, removed): todo and touched are (path, size, mtime, sha256)
+    tuples — todo needs extraction, touched only got a new stat with identical content.
+    """
+    known = {r[0]: r[1:] for r in conn.execute("SELECT path, size, mtime, sha256 FROM tds_index")}
+    todo, touched, seen = [], [], set()
+    for entry in os.scandir(root):
+        if not entry.is_file(): continue
+        if entry.name.endswith(".zip"):
+            keys = zip_keys(entry.path)
+            if keys is None: seen.update(p for p in known if p.startswith(entry.path + SEP)); continue  # mid-copy: keep what we have
+            for key in keys: _diff_member(key, None if full else known.get(key[0]), todo, touched); seen.add(key[0])
+        elif entry.name.endswith(".pdf") and _diff(entry.path, None if full else known.get(entry.path), todo, touched): seen.add(entry.path)
+    return todo, touched, [p for p in known if p not in seen]
+
+
+def reuse(conn, todo):
+    """Split todo into (results copied from an indexed row with the same sha256, still to extract).
+
+    A renamed or copied file keeps its content hash, so it needs no PyPDF2 pass.
+    """
+    reused, rest = [], []
+    for key in todo:
+        row = conn.execute(f"SELECT rowid, {', '.join(MAT_COLS)} FROM tds_index WHERE sha256=? AND error IS NULL LIMIT 1", (key[3],)).fetchone()
+        if row:
+            text = conn.execute("SELECT body FROM tds_fts WHERE rowid=?", (row[0],)).fetchone()
+            reused.append((key, {**_from_row(row[1:]), "name": _material_name(key[0]), "text": text[0] if text else ""}, None))
+        else: rest.append(key)
+    return reused, rest
+
+
+def unique(rest):
+    """{content hash: first path} — copies inside one batch (the same TDS filed under several prefixes) are parsed once."""
+    first = {}
+    for path, _, _, sha in rest: first.setdefault(sha, path)
+    return first
+
+
+def _copy(key, res):
+    """Result row for key from the extraction of an identical document, under key's own file name."""
+    mat, err = res[:2]
+    return key, {**mat, "name": _material_name(key[0])} if mat else None, err
+
+
+def apply(conn, results, touched=(), removed=()):
+    """Write extraction results [(key, material, error)] plus stat-only updates and deletions.
+
+    Bumps the catalog version whenever the material set may have changed.
+    """
+    now = time.time()
+    conn.executemany("UPDATE tds_index SET size=?, mtime=? WHERE path=?", [(s, m, p) for p, s, m, _ in touched])
+    gone = [(p,) for p in removed] + [(key[0],) for key, _, _ in results]
+    conn.executemany("DELETE FROM tds_fts WHERE rowid = (SELECT rowid FROM tds_index WHERE path=?)", gone)
+    conn.executemany("DELETE FROM tds_index WHERE path=?", [(p,) for p in removed])
+    rows = [(path, size, mtime, sha, *_to_row(mat), *_source(path), err, now) for (path, size, mtime, sha), mat, err in results]
+    conn.executemany(f"INSERT OR REPLACE INTO tds_index (path, size, mtime, sha256, {', '.join(MAT_COLS)}, year, customer, error, indexed_at) "
+                     f"VALUES ({', '.join('?' * (len(MAT_COLS) + 8))})", rows)
+    conn.executemany("INSERT INTO tds_fts (rowid, name, customer, body) SELECT rowid, name, customer, ? FROM tds_index WHERE path=?",
+                     [(mat.get("text") or "", key[0]) for key, mat, err in results if mat])
+    if rows or removed: _bump(conn)
+    conn.commit()
+    if rows or removed: catalog_version(conn)  # committed: publish the new version to this process right away
+
+
+def _bump(conn):
+    conn.execute("INSERT INTO catalog_meta VALUES ('version', 1) ON CONFLICT(key) DO UPDATE SET value = value + 1")
+    _VERSION[1] = -math.inf
+
+
+def catalog_version(conn=None):
+    """Catalog version. Without conn it is answered from memory: writes in this process refresh it
+    on commit, other writers (the CLI, a second server) are seen within VERSION_TTL."""
+    if conn is None:
+        if time.monotonic() - _VERSION[1] < VERSION_TTL: return _VERSION[0]
+        with closing(db.connect()) as conn: return catalog_version(conn)
+    row = conn.execute("SELECT value FROM catalog_meta WHERE key='version'").fetchone()
+    _VERSION[:] = [row[0] if row else 0, time.monotonic()]
+    return _VERSION[0]
+
+
+class ExtractTimeout(BaseException): pass  # BaseException: library-level `except Exception` must not swallow it
+
+
+def _alarm(signum, frame): raise ExtractTimeout()
+
+
+def rss_kb():
+    """(resident anonymous KB now, peak resident KB) for this process."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+    try:
+        with open("/proc/self/statm") as f: _, resident, shared = map(int, f.read().split()[:3])
+        return (resident - shared) * (os.sysconf("SC_PAGE_SIZE") // 1024), peak  # mmapped file pages are shared, not ours
+    except (OSError, ValueError): return 0, peak
+
+
+def _extract_chunk(paths, timeout=None):
+    """Extract a list of files -> [(path, material, error, seconds, (RSS growth KB, peak RSS KB))].
+
+    Runs inside pool workers; the per-file timeout uses SIGALRM, so it only
+    applies where that exists and we own the main thread.
+    """
+    alarm = bool(timeout) and hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+    if alarm: signal.signal(signal.SIGALRM, _alarm)
+    out = []
+    for path in paths:
+        t0, (before, _) = time.perf_counter(), rss_kb()
+        try:
+            if alarm: signal.setitimer(signal.ITIMER_REAL, timeout)
+            mat, err = extract_one(path)
+        except ExtractTimeout: mat, err = None, f"timeout after {timeout}s"
+        finally:
+            if alarm: signal.setitimer(signal.ITIMER_REAL, 0)
+        after, peak = rss_kb()
+        out.append((path, mat, err, time.perf_counter() - t0, (after - before, peak)))
+        gc.collect()  # PyPDF2 object graphs are cyclic: free them before the next document, not whenever
+    return out
+
+
+def _size(path, sizes):
+    if sizes and path in sizes: return sizes[path]
+    try: return os.path.getsize(_split(path)[0])
+    except OSError: return 0
+
+
+def _observe(out):
+    for path, mat, err, secs, _ in out:
+        EXTRACT_SECONDS.observe(secs)
+        EXTRACTED.inc(result="ok" if mat else "timeout" if err.startswith("timeout") else "worker_died" if err.startswith("worker died")
+                      else err.split(":", 1)[0])
+        SLOWEST[path] = secs
+    for path in sorted(SLOWEST, key=SLOWEST.get)[:-SLOWEST_N]: del SLOWEST[path]
+
+
+def extract_many(paths, workers=INDEX_WORKERS, chunksize=INDEX_CHUNKSIZE, timeout=INDEX_TIMEOUT, sizes=None, mem_mb=INDEX_MEM_MB):
+    """Extract paths, in a process pool when there is more than one chunk of work.
+
+    Chunks are submitted only while their estimated footprint fits in mem_mb
+    (one chunk always runs). sizes: {path: bytes} where already known.
+    Small batches run inline only where the SIGALRM timeout works (the main
+    thread); the watcher and request threads always go through the pool, so
+    one PDF that never finishes cannot wedge them.
+    """
+    t0, throttled = time.perf_counter(), 0
+    alarm = hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+    if not paths or ((workers <= 1 or len(paths) <= chunksize) and (alarm or not timeout)):
+        out = _extract_chunk(paths, timeout)
+    else:
+        # biggest files first so a late giant does not leave the other workers idle
+        paths = sorted(paths, key=lambda p: _size(p, sizes), reverse=True)
+        chunks = [paths[i:i + chunksize] for i in range(0, len(paths), chunksize)]
+        out, pending, inflight, budget = [], {}, 0, mem_mb << 20
+        recycle = {"max_tasks_per_child": INDEX_MAX_TASKS} if sys.version_info >= (3, 11) and INDEX_MAX_TASKS else {}
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(chunks))), mp_context=multiprocessing.get_context("spawn"), **recycle) as pool:
+            def collect(futs):
+                nonlocal inflight
+                for fut in futs:
+                    chunk, need = pending.pop(fut); inflight -= need
+                    try: out.extend(fut.result())
+                    except BrokenProcessPool as e: out.extend((p, None, f"worker died: {e}", 0.0, (0, 0)) for p in chunk)
+            for chunk in chunks:
+                need = sum(_size(p, sizes) for p in chunk) * MEM_FACTOR
+                if pending and inflight + need > budget: throttled += 1
+                while pending and inflight + need > budget: collect(wait(pending, return_when=FIRST_COMPLETED)[0])
+                pending[pool.submit(_extract_chunk, chunk, timeout)] = (chunk, need); inflight += need
+            collect(list(pending))
+    _observe(out)
+    heavy = sorted(out, key=lambda r: -r[4][0])[:5]
+    STATS["last_memory"] = {"budget_mb": mem_mb, "throttled": throttled, "docs": len(out), "s": round(time.perf_counter() - t0, 3),
+                            "peak_rss_mb": round(max([r[4][1] for r in out] + [rss_kb()[1]]) / 1024, 1),
+                            "top_docs_mb": [(os.path.basename(p), round(m[0] / 1024, 1)) for p, _, _, _, m in heavy if m[0] > 0]}
+    return out
+
+
+def percentiles(secs):
+    """{p50, p90, p99, max} in ms of per-file extraction times; None for an empty run."""
+    if not secs: return None
+    s = sorted(secs)
+    at = lambda q: round(s[min(len(s) - 1, int(q * len(s)))] * 1000, 2)
+    return {"p50": at(.5), "p90": at(.9), "p99": at(.99), "max": round(s[-1] * 1000, 2)}
+
+
+def _record(t0, cold, todo, touched, removed, failed):
+    ms = round((time.perf_counter() - t0) * 1000, 2)
+    STATS["runs"] += 1
+    if cold and todo: STATS["cold_ms"] = ms
+    if not todo: STATS["warm_ms"] = ms
+    STATS["last"] = {"ms": ms, "extracted": len(todo), "failed": failed, "touched": len(touched), "removed": len(removed), "at": time.time()}
+
+
+def refresh(root=TDS_PATH, workers=INDEX_WORKERS, chunksize=INDEX_CHUNKSIZE, timeout=INDEX_TIMEOUT, full=False, mem_mb=INDEX_MEM_MB):
+    """Bring the index in line with the directory, extracting only new/changed files.
+
+    full=True re-extracts everything; the old rows stay readable until the new ones commit.
+    Returns a run report with wall time and files/sec.
+    """
+    t0 = time.perf_counter()
+    with closing(db.connect()) as conn:
+        cold = full or conn.execute("SELECT COUNT(*) FROM tds_index").fetchone()[0] == 0
+        todo, touched, removed = plan(conn, root, full)
+        reused, rest = ([], todo) if full else reuse(conn, todo)
+        first = unique(rest)
+        done = {path: (mat, err, secs) for path, mat, err, secs, _ in extract_many(list(first.values()), workers, chunksize, timeout, {k[0]: k[1] for k in rest}, mem_mb)}
+        results = reused + [_copy(key, done[first[key[3]]]) for key in rest]
+        apply(conn, results, touched, removed)
+    failed = sum(1 for r in results if r[2])
+    _record(t0, cold, todo, touched, removed, failed)
+    wall = time.perf_counter() - t0
+    report = {"files": len(todo), "extracted": len(first), "failed": failed, "workers": workers if len(todo) > chunksize else 1,
+              "wall_s": round(wall, 3), "files_per_s": round(len(todo) / wall, 2) if todo else None,
+              "slowest": [(os.path.basename(p), round(v[2], 3)) for p, v in sorted(done.items(), key=lambda kv: -kv[1][2])[:5]],
+              "extract_ms": percentiles([v[2] for v in done.values()]),
+              "memory": STATS["last_memory"] if rest else None}
+    if todo: STATS["last_rebuild"] = report
+    return report
+
+
+def update_paths(paths):
+    """Targeted refresh for a handful of paths (watcher events); nothing else is scanned."""
+    with closing(db.connect()) as conn:
+        todo, touched, removed = [], [], []
+        for path in sorted(set(paths)):
+            if path.endswith(".zip"):
+                known, keys = _members(conn, path), zip_keys(path) if os.path.isfile(path) else []
+                if keys is None: continue
+                for key in keys: _diff_member(key, known.get(key[0]), todo, touched)
+                removed += [p for p in known if p not in {key[0] for key in keys}]
+                continue
+            k = conn.execute("SELECT size, mtime, sha256 FROM tds_index WHERE path=?", (path,)).fetchone()
+            if not (path.endswith(".pdf") and _diff(path, k, todo, touched)) and k: removed.append(path)
+        reused, rest = reuse(conn, todo)
+        # a burst (corpus copied in) goes to the process pool so the server's own threads keep the GIL
+        first = unique(rest)
+        done = {path: (mat, err) for path, mat, err, _, _ in extract_many(list(first.values()), sizes={k[0]: k[1] for k in rest})}
+        results = reused + [_copy(key, done[first[key[3]]]) for key in rest]
+        apply(conn, results, touched, removed)
+    return {"extracted": len(first), "duplicates": len(rest) - len(first), "reused": len(reused), "touched": len(touched), "removed": len(removed)}
+
+
+_MATS = (None, [], {}, [])  # (catalog version, materials, {customer: {year: materials}}, generic materials) — rebuilt when the version moves
+
+
+def _richness(doc):
+    """Sort key for picking the source that speaks for a product: most properties known, then newest."""
+    _, year, _, m = doc
+    return (bool(m["lambda_t"][0]), m["density"] != tds_extract.DEFAULT_DENSITY, bool(m["max_temp"]), bool(m["ccs"]), len(m["chem"]), year or 0)
+
+
+def _entry(key, docs):
+    path, _, _, mat = max(docs, key=_richness)
+    return {**mat, "name": canonical_name(path), "key": key, "sources": [_source_id(d[0]) for d in docs]}
+
+
+def _partition(groups):
+    """Catalog entries in name order, plus the per customer/year and generic (no "YYYY_Customer_" prefix) lists."""
+    mats = sorted(((_entry(k, docs), docs) for k, docs in groups.items()), key=lambda e: e[0]["name"])
+    parts, generic = {}, []
+    for m, docs in mats:
+        for _, year, customer, _ in docs:
+            part = generic if customer is None else parts.setdefault(customer, {}).setdefault(year, [])
+            if not part or part[-1] is not m: part.append(m)
+    return [m for m, _ in mats], parts, generic
+
+
+def _load():
+    global _MATS
+    if _MATS[0] is not None and _MATS[0] == catalog_version(): return _MATS  # hot path: no connection
+    with closing(db.connect()) as conn:
+        version = catalog_version(conn)
+        if _MATS[0] != version:
+            groups = {}
+            for path, year, customer, *row in conn.execute(f"SELECT path, year, customer, {', '.join(MAT_COLS)} FROM tds_index WHERE error IS NULL ORDER BY path"):
+                groups.setdefault(canonical_key(path), []).append((path, year, customer, _from_row(row)))
+            _MATS = (version, *_partition(groups))
+    return _MATS
+
+
+def load_materials():
+    """One catalog entry per canonical_key, with the properties of its richest source and links to all of them."""
+    return _load()[1]
+
+
+def partition(customer=None, year=None):
+    """Catalog slice for one plant: (matched customers, materials).
+
+    customer is a case-insensitive prefix ("hbis", "arcelor"); year narrows it
+    to the sources filed that year. The generic products are always included.
+    Unknown customer -> ([], []).
+    """
+    _, mats, parts, generic = _load()
+    names = [c for c in parts if customer is None or c.casefold().startswith(customer.casefold())]
+    if not names: return [], []
+    picked = {id(m) for m in generic}
+    for c in names: picked.update(id(m) for y, ms in parts[c].items() if year is None or y == year for m in ms)
+    return sorted(names), [m for m in mats if id(m) in picked]
+
+
+def partitions():
+    """[{customer, years: {year: materials}, materials}] for every customer partition, plus the generic count."""
+    _, _, parts, generic = _load()
+    return {"customers": [{"customer": c, "years": {y: len(ms) for y, ms in sorted(years.items())},
+                           "materials": len({id(m) for ms in years.values() for m in ms})} for c, years in sorted(parts.items())],
+            "generic": len(generic)}
+
+
+def source_path(source, root=TDS_PATH):
+    """Indexed path for a catalog source id, or None if it is not in the index."""
+    path = os.path.join(root, source)
+    with closing(db.connect()) as conn:
+        return path if conn.execute("SELECT 1 FROM tds_index WHERE path=?", (path,)).fetchone() else None
+
+
+def read_source(path):
+    with _open(path) as f: return f.read()
+
+
+_TABLES = (None, {})  # (materials list it was built from, lambda_tables()) — same lifetime as _MATS
+
+
+def lambda_tables():
+    """{material name: (temps °C, λ W/mK)} for every material with a conductivity table."""
+    global _TABLES
+    mats = _load()[1]
+    if _TABLES[0] is not mats: _TABLES = (mats, {m["name"]: m["lambda_t"] for m in mats if m["lambda_t"][0]})
+    return _TABLES[1]
+
+
+def fts_query(q):
+    """Free text -> FTS5 query: every word must match, each as a prefix ("cast lw 13" -> "CAST"* "LW"* "13"*)."""
+    return " ".join(f'"{w}"*' for w in re.findall(r"\w+", q.upper()))
+
+
+def search(q, customer=None, year=None, limit=20, offset=0):
+    """bm25-ranked catalog materials for q (name > customer > text), optionally narrowed to a customer prefix / year.
+
+    Documents are ranked, then folded onto their catalog entry (canonical_key):
+    a product ranks by its best source and is listed once, with every matching
+    source. Returns (total matching products, page of hits with the best source's snippet).
+    """
+    match = fts_query(q)
+    if not match: return 0, []
+    if customer is not None: customer = re.sub(r"([\\%_])", r"\\\1", customer)  # a literal prefix, not a LIKE pattern
+    where = "tds_fts MATCH ?1 AND (?2 IS NULL OR i.customer LIKE ?2 || '%' ESCAPE '\\') AND (?3 IS NULL OR i.year = ?3)"
+    join = "FROM tds_fts JOIN tds_index i ON i.rowid = tds_fts.rowid"
+    with closing(db.connect()) as conn:
+        groups = {}
+        for rowid, path, cust, yr, score in conn.execute(f"SELECT i.rowid, i.path, i.customer, i.year, bm25(tds_fts, 10.0, 2.0, 1.0) AS score "
+                                                          f"{join} WHERE {where} ORDER BY score", (match, customer, year)):
+            groups.setdefault(canonical_key(path), []).append((rowid, path, cust, yr, -score))
+        page = list(groups.items())[offset:offset + limit]
+        best = [docs[0][0] for _, docs in page]
+        snippets = dict(conn.execute(f"SELECT rowid, snippet(tds_fts, 2, '[', ']', '…', 12) FROM tds_fts WHERE tds_fts MATCH ? "
+                                     f"AND rowid IN ({', '.join('?' * len(best))})", (match, *best))) if best else {}
+    by_key = {m["key"]: m for m in load_materials()}
+    hits = []
+    for key, docs in page:
+        rowid, path, cust, yr, score = docs[0]
+        m = by_key.get(key, {"name": canonical_name(path), "density": None, "lambda_val": None, "max_temp": None})
+        hits.append({"name": m["name"], "key": key, "customer": cust, "year": yr, "density": m["density"], "lambda_val": m["lambda_val"],
+                     "max_temp": m["max_temp"], "score": round(score, 3), "snippet": snippets.get(rowid),
+                     "source": _source_id(path), "sources": [_source_id(d[1]) for d in docs]})
+    return len(groups), hits
+
+
+def summary():
+    with closing(db.connect()) as conn:
+        docs, failed = conn.execute("SELECT COUNT(*), COUNT(error) FROM tds_index").fetchone()
+        version = catalog_version(conn)
+    return {**STATS, "documents": docs, "failed": failed, "catalog_version": version}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build or refresh the TDS material index")
+    ap.add_argument("--root", default=TDS_PATH)
+    ap.add_argument("--workers", type=int, default=INDEX_WORKERS)
+    ap.add_argument("--chunksize", type=int, default=INDEX_CHUNKSIZE)
+    ap.add_argument("--timeout", type=float, default=INDEX_TIMEOUT)
+    ap.add_argument("--mem-mb", type=int, default=INDEX_MEM_MB, help="RSS budget for documents in flight")
+    ap.add_argument("--full", action="store_true", help="drop the index and re-extract every file")
+    a = ap.parse_args()
+    with closing(db.connect()) as conn: init_schema(conn); conn.commit()
+    json.dump(refresh(a.root, a.workers, a.chunksize, a.timeout, a.full, a.mem_mb), sys.stdout, indent=1)
+    print()
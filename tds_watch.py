@@ -0,0 +1,121 @@
+"""
+Background watcher for the TDS directory.
+
+Uses inotify (Linux, straight through libc) and falls back to stat polling
+anywhere else. Changed paths are debounced and handed to
+tds_index.update_paths(), so only the affected rows (for an archive: the
+members whose CRC moved) are re-extracted and the catalog version moves —
+/api/init never needs a full rescan while it runs.
+"""
+import os, time, struct, select, ctypes, ctypes.util, threading, traceback
+import tds_index
+from config import TDS_PATH, WATCH_POLL_S
+
+IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_DELETE = 0x8, 0x40, 0x80, 0x200
+IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW = 0x400, 0x800, 0x4000
+IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT = struct.Struct("iIII")
+
+
+def _inotify(root):
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if fd < 0: raise OSError(ctypes.get_errno(), "inotify_init1")
+    if libc.inotify_add_watch(fd, os.fsencode(root), MASK) < 0:
+        os.close(fd); raise OSError(ctypes.get_errno(), f"inotify_add_watch {root}")
+    return fd
+
+
+def _snapshot(root):
+    snap = {}
+    for entry in os.scandir(root):
+        if entry.name.endswith((".pdf", ".zip")):
+            try: st = entry.stat(); snap[entry.path] = (st.st_size, st.st_mtime)
+            except OSError: pass
+    return snap
+
+
+class Watcher:
+    def __init__(self, root=TDS_PATH, debounce=0.5, poll=WATCH_POLL_S):
+        self.root, self.debounce, self.poll = root, debounce, poll
+        self.mode = None
+        self.stats = {"events": 0, "batches": 0, "rescans": 0, "errors": 0, "last_batch": None}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def alive(self): return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="tds-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread: self._thread.join(timeout)
+
+    def _run(self):
+        try: fd = _inotify(self.root)
+        except (OSError, AttributeError): fd = None
+        # catch up on whatever changed while we were down, then only follow events
+        self._rescan()
+        if fd is None:
+            self.mode = "poll"; self._poll_loop()
+        else:
+            self.mode = "inotify"
+            try: self._inotify_loop(fd)
+            finally: os.close(fd)
+
+    def _rescan(self):
+        self.stats["rescans"] += 1
+        try: tds_index.refresh(self.root)
+        except Exception: self.stats["errors"] += 1; traceback.print_exc()
+
+    def _flush(self, paths):
+        try:
+            res = tds_index.update_paths(paths)
+            self.stats["batches"] += 1
+            self.stats["last_batch"] = {**res, "paths": len(paths), "at": time.time()}
+        except Exception: self.stats["errors"] += 1; traceback.print_exc()
+
+    def _inotify_loop(self, fd):
+        pending, last, since = set(), 0.0, 0.0
+        while not self._stop.is_set():
+            ready, _, _ = select.select([fd], [], [], self.debounce)
+            now = time.monotonic()
+            if ready:
+                if not pending: since = now
+                buf = os.read(fd, 64 * 1024)
+                for off in self._offsets(buf):
+                    _, mask, _, n = EVENT.unpack_from(buf, off)
+                    self.stats["events"] += 1
+                    if mask & IN_Q_OVERFLOW: self._rescan(); pending.clear(); continue
+                    if mask & (IN_DELETE_SELF | IN_MOVE_SELF): return self._poll_loop()  # directory itself went away
+                    name = buf[off + EVENT.size:off + EVENT.size + n].rstrip(b"\0")
+                    if name: pending.add(os.path.join(self.root, os.fsdecode(name)))
+                last = now
+            # flush once the directory goes quiet, or anyway during a long copy burst
+            if pending and (now - last >= self.debounce or now - since >= 10 * self.debounce):
+                self._flush(pending); pending = set()
+
+    @staticmethod
+    def _offsets(buf):
+        off = 0
+        while off + EVENT.size <= len(buf):
+            yield off
+            off += EVENT.size + EVENT.unpack_from(buf, off)[3]
+
+    def _poll_loop(self):
+        self.mode = "poll"
+        snap = _snapshot(self.root) if os.path.isdir(self.root) else {}
+        while not self._stop.wait(self.poll):
+            if not os.path.isdir(self.root): continue
+            cur = _snapshot(self.root)
+            changed = {p for p in cur.keys() | snap.keys() if cur.get(p) != snap.get(p)}
+            if changed: self.stats["events"] += len(changed); self._flush(changed)
+            snap = cur
+
+    def summary(self):
+        return {"mode": self.mode, "alive": self.alive, "root": self.root, **self.stats}
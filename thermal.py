@@ -0,0 +1,227 @@
+"""
+Lining heat-transfer models.
+
+Everything here works on NumPy arrays shaped (scenarios, layers) so a whole
+batch of lining variants is evaluated in a handful of vector operations.
+Stacks with fewer layers are zero-padded: a 0 mm layer adds no resistance,
+weight or cost.
+"""
+import numpy as np
+
+R_SURF = 0.12  # m²K/W, shell -> ambient surface resistance
+LAMBDA_MIN = 0.01  # stands in for a missing/zero λ, as in /api/simulate
+
+
+def pad(rows, fill=0.0):
+    """Ragged list of per-layer values -> (n, max_layers) float array."""
+    try: return np.asarray(rows, dtype=float).reshape(len(rows), -1)
+    except ValueError:
+        out = np.full((len(rows), max(map(len, rows), default=0)), fill)
+        for i, r in enumerate(rows): out[i, :len(r)] = r
+        return out
+
+
+def steady_batch(thickness, lam, density, price, t_hot, t_amb, r_surf=R_SURF):
+    """Series-resistance steady state for many stacks at once.
+
+    thickness mm, lam W/mK, density kg/m3, price €/t — all (n, layers);
+    t_hot/t_amb scalars or (n,). Returns a dict of (n,) arrays.
+    """
+    d = np.asarray(thickness, dtype=float) / 1000
+    r = r_surf + (d / np.where(lam > 0, lam, LAMBDA_MIN)).sum(axis=1)
+    q = (np.asarray(t_hot, dtype=float) - t_amb) / r
+    w = d * density
+    return {"shell_temp": t_amb + q * r_surf, "heat_flux": q, "total_r": r,
+            "total_weight": w.sum(axis=1), "total_cost": (w / 1000 * price).sum(axis=1)}
+
+
+def pareto_front(obj, block=512):
+    """Indices of the non-dominated rows of obj (n, k), all objectives minimised.
+
+    Rows are swept in lexicographic order, so anything that can dominate a row
+    has already been seen: each block is checked against the front so far and
+    then against itself, all in broadcast comparisons.
+    """
+    order = np.lexsort(obj.T[::-1])
+    front = np.empty((0, obj.shape[1])); keep = []
+    for s in range(0, len(order), block):
+        idx = order[s:s + block]; p = obj[idx]
+        if len(front):
+            dom = ((front[:, None] <= p[None]).all(2) & (front[:, None] < p[None]).any(2)).any(0)
+            idx, p = idx[~dom], p[~dom]
+        dom = ((p[:, None] <= p[None]).all(2) & (p[:, None] < p[None]).any(2)).any(0)
+        idx, p = idx[~dom], p[~dom]
+        front = np.vstack([front, p]); keep.extend(idx.tolist())
+    return np.asarray(keep, dtype=int)
+
+
+def optimize(lam, density, price, lo, hi, t_hot, t_amb, max_shell, budget=100_000, r_surf=R_SURF, chunk=65_536):
+    """Grid search of layer thicknesses (mm) for an ordered stack.
+
+    Every free layer (min < max) gets the same number of grid points, as many as
+    fit in `budget` combinations; fixed layers get one. Stacks with shell temperature <= max_shell are kept and the
+    Pareto front of (cost, weight, shell temperature) is returned as
+    (thickness (m, layers), objectives (m, 3)) sorted by cost, plus the number
+    of evaluated and feasible stacks.
+    """
+    lam = np.where(np.asarray(lam, dtype=float) > 0, lam, LAMBDA_MIN)
+    lo, hi = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+    n, free = len(lam), hi > lo
+    k = max(2, int(round(budget ** (1 / max(free.sum(), 1)), 6)))
+    ks = np.where(free, k, 1)
+    grids = np.stack([np.linspace(a, b, k) for a, b in zip(lo, hi)])  # (layers, k)
+    total = int(np.prod(ks))
+    strides = np.concatenate([np.cumprod(ks[::-1])[::-1][1:], [1]])
+    # per-mm contributions, so each chunk is three mat-vec products
+    r_mm, w_mm = 1 / (1000 * lam), np.asarray(density, dtype=float) / 1000
+    c_mm = w_mm * np.asarray(price, dtype=float) / 1000
+    th_ok, obj_ok = [], []
+    for s in range(0, total, chunk):
+        i = np.arange(s, min(s + chunk, total))
+        th = grids[np.arange(n), (i[:, None] // strides) % ks]
+        q = (t_hot - t_amb) / (r_surf + th @ r_mm)
+        shell = t_amb + q * r_surf
+        ok = shell <= max_shell
+        th_ok.append(th[ok]); obj_ok.append(np.column_stack([th[ok] @ c_mm, th[ok] @ w_mm, shell[ok]]))
+    th, obj = np.concatenate(th_ok), np.concatenate(obj_ok)
+    if len(obj):
+        obj_r = np.round(obj, 1)  # ties at display precision are not worth separate points
+        _, first = np.unique(obj_r, axis=0, return_index=True)
+        front = first[pareto_front(obj_r[first])]
+        front = front[np.argsort(obj[front, 0])]
+        return th[front], obj[front], total, len(obj)
+    return th, obj, total, 0
+
+
+def _curve_at(curve, hours):
+    """Hot-face temperature from a [[hour, °C], ...] heat-up curve, held flat past its ends."""
+    h, t = np.asarray(curve, dtype=float).T
+    return np.interp(hours, h, t)
+
+
+def transient(thickness, lam, density, cp, curve, t_amb, hours=None, dx_mm=2.0, dt_s=60.0,
+              drying_temp=110.0, samples=200, r_surf=R_SURF):
+    """1D heat-up of a lining: implicit (backward Euler) finite volumes through the layers.
+
+    The hot face follows `curve`, the shell loses heat to ambient through r_surf.
+    Properties are constant per layer, so the tridiagonal system is the same at
+    every step: it is factored once (Thomas) and each step is one O(n) forward
+    sweep plus back substitution.
+
+    Returns (times h, temperatures (samples, layers + 2): hot face, the cold-side
+    cell of every layer, shell surface; hours at which each layer's cold side reached
+    drying_temp or None, cell count, step count).
+    """
+    if min(thickness, default=0) <= 0: raise ValueError("transient needs at least one layer, all with positive thickness")
+    hours = float(hours if hours is not None else curve[-1][0])
+    # cells: each layer split into equal cells of about dx_mm
+    dx, k, c, last = [], [], [], []
+    for th, l, rho, c_p in zip(thickness, lam, density, cp):
+        m = max(1, int(np.ceil(th / dx_mm)))
+        dx += [th / 1000 / m] * m; k += [max(l, LAMBDA_MIN)] * m; c += [rho * c_p * th / 1000 / m / dt_s] * m
+        last.append(len(dx) - 1)
+    n = len(dx)
+    g = [1 / (dx[i] / (2 * k[i]) + dx[i + 1] / (2 * k[i + 1])) for i in range(n - 1)]  # cell-to-cell conductances
+    g_hot, g_cold = 2 * k[0] / dx[0], 1 / (dx[-1] / (2 * k[-1]) + r_surf)
+    # A T' = C T + boundary terms; A = diag + off-diagonals -g
+    diag = [c[i] + (g[i - 1] if i else g_hot) + (g[i] if i < n - 1 else g_cold) for i in range(n)]
+    inv_m, cp_ = [0.0] * n, [0.0] * n  # Thomas factorisation, done once
+    inv_m[0] = 1 / diag[0]; cp_[0] = -g[0] * inv_m[0] if n > 1 else 0.0
+    for i in range(1, n):
+        inv_m[i] = 1 / (diag[i] + g[i - 1] * cp_[i - 1])
+        cp_[i] = -g[i] * inv_m[i] if i < n - 1 else 0.0
+    steps = max(1, int(np.ceil(hours * 3600 / dt_s)))
+    t_hot = _curve_at(curve, np.arange(1, steps + 1) * dt_s / 3600).tolist()
+    every = max(1, steps // samples)
+    T = [float(t_amb)] * n; d = [0.0] * n
+    times, out, dried = [0.0], [[float(t_amb)] * (len(last) + 2)], [None] * len(last)
+    ga = g_cold * t_amb
+    for s in range(steps):
+        # forward sweep: d'_i = (rhs_i + g_{i-1} d'_{i-1}) / m_i
+        d[0] = (c[0] * T[0] + g_hot * t_hot[s]) * inv_m[0]
+        for i in range(1, n): d[i] = (c[i] * T[i] + g[i - 1] * d[i - 1]) * inv_m[i]
+        d[-1] += ga * inv_m[-1]
+        T[-1] = d[-1]
+        for i in range(n - 2, -1, -1): T[i] = d[i] - cp_[i] * T[i + 1]
+        for j, i in enumerate(last):
+            if dried[j] is None and T[i] >= drying_temp: dried[j] = (s + 1) * dt_s / 3600
+        if (s + 1) % every == 0 or s == steps - 1:
+            shell = T[-1] - (T[-1] - t_amb) * g_cold * dx[-1] / (2 * k[-1])
+            times.append((s + 1) * dt_s / 3600); out.append([t_hot[s]] + [T[i] for i in last[:-1]] + [T[-1], shell])
+    return np.asarray(times), np.asarray(out), dried, n, steps
+
+
+# λ(T) tables are resampled onto one uniform grid so every stack/layer shares the same segment lookup
+T_GRID = np.arange(-50.0, 2501.0, 25.0)
+SOLVER_STATS = {"calls": 0, "stacks": 0, "iterations": 0, "max_iter": 0, "not_converged": 0}
+
+
+def lambda_grid(table, fallback=LAMBDA_MIN):
+    """λ on T_GRID from a (temps, lams) table, held flat beyond its ends; constant when empty."""
+    temps, lams = table
+    if not len(temps): return np.full(T_GRID.shape, max(fallback, LAMBDA_MIN))
+    return np.maximum(np.interp(T_GRID, temps, lams), LAMBDA_MIN)
+
+
+def steady_nonlinear(thickness, lamg, t_hot, t_amb, idx=None, r_surf=R_SURF, tol=0.01, max_iter=30):
+    """Steady state with temperature-dependent λ, batched over stacks.
+
+    Kirchhoff transform: per layer Θ(T) = ∫λ dT, so the flux through a layer is
+    q = (Θ(T_in) - Θ(T_out)) / d. With λ piecewise linear on T_GRID, Θ is
+    piecewise quadratic and inverts exactly. For a trial q the interface
+    temperatures follow by marching from the hot face; Newton on q closes the
+    shell balance T_shell - t_amb = q r_surf, usually in 3-5 iterations.
+
+    thickness (m, L) mm; lamg either (m, L, len(T_GRID)) or, with idx (m, L)
+    pointing into it, one row per distinct material (u, len(T_GRID)).
+    Returns (interface temps (m, L+1) hot face -> shell, q (m,), iterations (m,)).
+    """
+    d = np.asarray(thickness, dtype=float) / 1000
+    m, L = d.shape
+    if idx is None: lamg, idx = lamg.reshape(m * L, -1), np.arange(m * L).reshape(m, L)
+    t_hot = np.broadcast_to(np.asarray(t_hot, dtype=float), (m,))
+    dg = T_GRID[1] - T_GRID[0]
+    slope = np.diff(lamg, axis=1) / dg
+    theta = np.concatenate([np.zeros((len(lamg), 1)), np.cumsum((lamg[:, 1:] + lamg[:, :-1]) / 2 * dg, axis=1)], axis=1)
+
+    def seg(T):
+        j = np.clip(((T - T_GRID[0]) // dg).astype(int), 0, len(T_GRID) - 2)
+        return j, T - T_GRID[j]
+
+    def lam_at(i, T):
+        (j, dt), u = seg(T), idx[:, i]
+        return lamg[u, j] + slope[u, j] * dt
+
+    def theta_at(i, T):
+        (j, dt), u = seg(T), idx[:, i]
+        return theta[u, j] + lamg[u, j] * dt + slope[u, j] * dt * dt / 2
+
+    def theta_inv(i, v):
+        u = idx[:, i]
+        j = np.clip((theta[u] <= v[:, None]).sum(1) - 1, 0, len(T_GRID) - 2)
+        r, l0, s = v - theta[u, j], lamg[u, j], slope[u, j]
+        return T_GRID[j] + 2 * r / (l0 + np.sqrt(np.maximum(l0 * l0 + 2 * s * r, 0)))
+
+    def march(q):
+        T = np.empty((m, L + 1)); T[:, 0] = t_hot; dT = np.zeros(m)
+        for i in range(L):
+            T[:, i + 1] = np.clip(theta_inv(i, theta_at(i, T[:, i]) - q * d[:, i]), T_GRID[0], T_GRID[-1])
+            dT = (lam_at(i, T[:, i]) * dT - d[:, i]) / lam_at(i, T[:, i + 1])
+        return T, dT
+
+    # start from the constant-λ solution with λ taken at the mid temperature
+    lam_mid = np.stack([lam_at(i, (t_hot + t_amb) / 2) for i in range(L)], axis=1)
+    q = (t_hot - t_amb) / (r_surf + (d / lam_mid).sum(1))
+    iters = np.zeros(m, dtype=int); active = np.ones(m, dtype=bool)
+    for _ in range(max_iter):
+        T, dT = march(q)
+        f = T[:, -1] - t_amb - q * r_surf
+        active = np.abs(f) > tol
+        if not active.any(): break
+        iters += active
+        step = f / (dT - r_surf)
+        q = np.where(active, np.where(q - step > 0, q - step, q / 2), q)
+    SOLVER_STATS["calls"] += 1; SOLVER_STATS["stacks"] += m
+    SOLVER_STATS["iterations"] += int(iters.sum()); SOLVER_STATS["max_iter"] = max(SOLVER_STATS["max_iter"], int(iters.max(initial=0)))
+    SOLVER_STATS["not_converged"] += int(active.sum())
+    return T, q, iters